@@ -6,3 +6,4 @@ admin.site.register(CustomUser)
 admin.site.register(Customer)
 admin.site.register(Rider)
 admin.site.register(UserVerification)
+admin.site.register(RiderLocation)
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.6 on 2026-10-16 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_riderverification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiderLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current_lat', models.FloatField()),
+                ('current_long', models.FloatField()),
+                ('recorded_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('rider', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='location', to='accounts.rider')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='riderlocation',
+            index=models.Index(fields=['current_lat', 'current_long'], name='rider_location_lat_long_idx'),
+        ),
+    ]
@@ -78,3 +78,25 @@ class Rider(models.Model):
 class RiderVerification(models.Model):
     rider = models.OneToOneField(Rider, on_delete=models.CASCADE)
     paystack_account_verification = models.BooleanField(default=False)
+
+
+class RiderLocation(models.Model):
+    """Latest position reported by a rider's app, kept locally for dispatch."""
+
+    rider = models.OneToOneField(
+        Rider, on_delete=models.CASCADE, related_name="location"
+    )
+    current_lat = models.FloatField()
+    current_long = models.FloatField()
+    recorded_at = models.DateTimeField()
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["current_lat", "current_long"], name="rider_location_lat_long_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.rider} ({self.current_long},{self.current_lat})"
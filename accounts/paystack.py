@@ -1,6 +1,10 @@
-import requests
 from django.conf import settings
 
+from map_clients.http import PooledSession
+from map_clients.rate_limit import get_rate_limiter
+
+paystack_session = PooledSession()
+
 
 class PaystackServices:
     def __init__(self, email="", first_name="", last_name="", phone_number=""):
@@ -10,6 +14,7 @@ class PaystackServices:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
+        self.rate_limiter = get_rate_limiter("paystack")
         self.email = email
         self.first_name = first_name
         self.last_name = last_name
@@ -22,7 +27,8 @@ class PaystackServices:
             "last_name": self.last_name,
             "phone": self.phone_number,
         }
-        response = requests.post(self.base_url, headers=self.headers, json=data)
+        self.rate_limiter.acquire(timeout=settings.RATE_LIMIT_TIMEOUT_SECONDS)
+        response = paystack_session.post(self.base_url, headers=self.headers, json=data)
         response.raise_for_status()
         data = response.json()
         return data
@@ -41,7 +47,8 @@ class PaystackServices:
             "last_name": self.last_name,
         }
 
-        response = requests.post(url, headers=self.headers, json=params)
+        self.rate_limiter.acquire(timeout=settings.RATE_LIMIT_TIMEOUT_SECONDS)
+        response = paystack_session.post(url, headers=self.headers, json=params)
         response.raise_for_status()
         data = response.json()
         return data
@@ -50,7 +57,8 @@ class PaystackServices:
         url = f"{self.base_url}/{email_or_code}"
         headers = {"Authorization": f"Bearer {self.api_key}"}
 
-        response = requests.get(url, headers=headers)
+        self.rate_limiter.acquire(timeout=settings.RATE_LIMIT_TIMEOUT_SECONDS)
+        response = paystack_session.get(url, headers=headers)
         response.raise_for_status()
         data = response.json()
         return data["data"]
@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Rider
+
+logger = logging.getLogger(__name__)
+
+RiderProfile = namedtuple(
+    "RiderProfile",
+    ["min_capacity", "max_capacity", "fragile_item_allowed", "charge_per_km", "vehicle_type"],
+)
+
+PROFILE_FIELDS = [
+    "user__email",
+    "min_capacity",
+    "max_capacity",
+    "fragile_item_allowed",
+    "charge_per_km",
+    "vehicle_type",
+]
+
+
+class RiderProfileCache:
+    """
+    In-memory table of the rider fields dispatch filters on, keyed by email.
+
+    The table is loaded with one query and kept until a Rider is deleted or
+    saved with a changed email or profile field. The saving process patches its own copy directly and bumps a
+    version key in the ``cache_alias`` Django cache (the shared Redis when
+    deployed) so other processes reload on their next read; ``ttl`` bounds
+    staleness when the cache is not shared.
+    """
+
+    version_key = "rider_profiles_version"
+
+    def __init__(self, ttl=300, cache_alias="default"):
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self._profiles = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _current_version(self):
+        return self.cache.get_or_set(self.version_key, 1, timeout=None)
+
+    def _load(self, version):
+        self._profiles = {
+            email: RiderProfile(*fields)
+            for email, *fields in Rider.objects.values_list(*PROFILE_FIELDS)
+        }
+        self._version = version
+        self._loaded_at = time.monotonic()
+
+    @property
+    def profiles(self):
+        version = self._current_version()
+        with self._lock:
+            expired = time.monotonic() - self._loaded_at > self.ttl
+            if self._profiles is None or version != self._version or expired:
+                self._load(version)
+            return self._profiles
+
+    def get(self, email):
+        return self.profiles.get(email)
+
+    @staticmethod
+    def profile_of(rider):
+        return RiderProfile(
+            rider.min_capacity,
+            rider.max_capacity,
+            rider.fragile_item_allowed,
+            rider.charge_per_km,
+            rider.vehicle_type,
+        )
+
+    def changed(self, rider):
+        """Whether a rider's email or profile fields differ from the cached entry."""
+        return self.get(rider.user.email) != self.profile_of(rider)
+
+    def update(self, rider):
+        """Patch the entry of a saved rider and tell other processes to reload."""
+        try:
+            version = self.cache.incr(self.version_key)
+        except ValueError:
+            version = self._current_version()
+        with self._lock:
+            if self._profiles is not None:
+                self._profiles[rider.user.email] = self.profile_of(rider)
+                self._version = version
+
+    def remove(self, email):
+        try:
+            version = self.cache.incr(self.version_key)
+        except ValueError:
+            version = self._current_version()
+        with self._lock:
+            if self._profiles is not None:
+                self._profiles.pop(email, None)
+                self._version = version
+
+    def eligible(self, emails, min_weight, max_weight=None, fragile=False):
+        """
+        Filter riders that can carry the given weights.
+
+        Args:
+            emails (iterable): Rider emails to check.
+            min_weight: Lightest package; the rider's min_capacity must not exceed it.
+            max_weight: Heaviest package, defaults to ``min_weight``; the rider's
+                max_capacity must cover it.
+            fragile (bool): Whether the rider must accept fragile items.
+
+        Returns:
+            list: The eligible emails, in input order.
+        """
+        if max_weight is None:
+            max_weight = min_weight
+        profiles = self.profiles
+        eligible = []
+        for email in emails:
+            profile = profiles.get(email)
+            if (
+                profile is None
+                or profile.min_capacity is None
+                or profile.max_capacity is None
+            ):
+                continue
+            if profile.min_capacity > min_weight or profile.max_capacity < max_weight:
+                continue
+            if fragile and not profile.fragile_item_allowed:
+                continue
+            eligible.append(email)
+        return eligible
+
+    def average_charge_per_km(self, emails):
+        """Average charge_per_km of the given riders, ignoring unset charges."""
+        profiles = self.profiles
+        charges = [
+            profiles[email].charge_per_km
+            for email in emails
+            if email in profiles and profiles[email].charge_per_km is not None
+        ]
+        if not charges:
+            return None
+        return sum(charges, Decimal(0)) / len(charges)
+
+
+rider_profiles = RiderProfileCache(
+    ttl=settings.RIDER_PROFILE_CACHE_TTL_SECONDS,
+    cache_alias=settings.RIDER_PROFILE_CACHE_ALIAS,
+)
@@ -139,3 +139,12 @@ class RiderDetailSerializer(serializers.ModelSerializer):
             "ratings",
             "completed_orders",
         )
+
+
+class RiderLocationPingSerializer(serializers.Serializer):
+    """A single location ping sent by the rider app."""
+
+    email = serializers.EmailField(required=False)
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    long = serializers.FloatField(min_value=-180, max_value=180)
+    recorded_at = serializers.DateTimeField(required=False)
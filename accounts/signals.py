@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CustomUser, Rider
+from .rider_profiles import rider_profiles
+
+# Rider fields held by the profile cache; saves touching none of them, such
+# as declined or completed order counts, leave it alone
+PROFILE_MODEL_FIELDS = {
+    "user", "min_capacity", "max_capacity", "fragile_item_allowed", "charge_per_km", "vehicle_type",
+}
+
+
+# Wait for the commit so a rolled back registration never reaches the cache
+@receiver(post_save, sender=Rider)
+def refresh_rider_profile(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not PROFILE_MODEL_FIELDS.intersection(update_fields):
+        return
+    if created or rider_profiles.changed(instance):
+        transaction.on_commit(lambda: rider_profiles.update(instance))
+
+
+@receiver(post_save, sender=CustomUser)
+def refresh_rider_profile_email(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and "email" not in update_fields):
+        return
+    rider = Rider.objects.select_related("user").filter(user=instance).first()
+    if rider is not None and rider_profiles.changed(rider):
+        transaction.on_commit(lambda: rider_profiles.update(rider))
+
+
+@receiver(post_delete, sender=Rider)
+def drop_rider_profile(sender, instance, **kwargs):
+    email = instance.user.email
+    transaction.on_commit(lambda: rider_profiles.remove(email))
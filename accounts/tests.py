@@ -0,0 +1,32 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from accounts import signals
+
+
+@mock.patch("accounts.signals.transaction.on_commit", side_effect=lambda func: func())
+@mock.patch("accounts.signals.rider_profiles")
+class RiderProfileSignalTests(SimpleTestCase):
+    def save(self, **kwargs):
+        signals.refresh_rider_profile(sender=None, instance=mock.sentinel.rider, **kwargs)
+
+    def test_counter_update_leaves_the_cache_alone(self, profiles, on_commit):
+        self.save(created=False, update_fields=frozenset({"declined_requests"}))
+
+        profiles.changed.assert_not_called()
+        profiles.update.assert_not_called()
+
+    def test_unchanged_profile_is_not_bumped(self, profiles, on_commit):
+        profiles.changed.return_value = False
+
+        self.save(created=False)
+
+        profiles.update.assert_not_called()
+
+    def test_changed_profile_is_updated(self, profiles, on_commit):
+        profiles.changed.return_value = True
+
+        self.save(created=False, update_fields=frozenset({"max_capacity"}))
+
+        profiles.update.assert_called_once_with(mock.sentinel.rider)
@@ -26,4 +26,9 @@ urlpatterns = [
         "reset_password/", views.UserPasswordResetView.as_view(), name="reset_password"
     ),
     path("verify-rider/", views.VerifyRiderView.as_view(), name="verify-rider"),
+    path(
+        "riders/locations/",
+        views.RiderLocationBatchView.as_view(),
+        name="rider-locations",
+    ),
 ]
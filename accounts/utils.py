@@ -2,11 +2,13 @@ from celery import shared_task
 from django.utils import timezone
 from django.core.mail import send_mail
 from smtplib import SMTPException
+from map_clients.rider_set import RiderSet, as_rider_set
 from map_clients.supabase_query import SupabaseTransactions
 import pyotp
 from django.conf import settings
 from .models import CustomUser, UserVerification
-from math import radians, sin, cos, sqrt, atan2
+from math import radians, degrees, sin, cos, sqrt, atan2
+import numpy as np
 import logging
 from functools import wraps
 import time
@@ -14,6 +16,29 @@ import time
 logger = logging.getLogger(__name__)
 
 
+EARTH_RADIUS_KM = 6371
+
+
+def batch_haversine(lat1, lon1, lat2, lon2):
+    """
+    Vectorized Haversine distance in kilometers.
+
+    Parameters:
+    lat1, lon1: Latitude and longitude of the first points (in degrees), scalars or arrays.
+    lat2, lon2: Latitude and longitude of the second points (in degrees), scalars or arrays.
+
+    Returns:
+    Array of distances in kilometers, broadcast over the inputs.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
 class DistanceCalculator:
     def __init__(self, origin):
         self.origin = origin
@@ -39,35 +64,98 @@ class DistanceCalculator:
         dlon = lon2 - lon1
         a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
         c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        distance = 6371 * c  # Earth radius in kilometers
+        distance = EARTH_RADIUS_KM * c  # Earth radius in kilometers
         return distance
 
+    def bounding_box(self, radius):
+        """
+        Calculate the lat/long box that encloses a circle around the origin.
+
+        Parameters:
+        radius: Radius in kilometers.
+
+        Returns:
+        Dict with 'min_lat', 'max_lat', 'min_long' and 'max_long' keys (in degrees).
+        """
+        lat_delta = degrees(radius / EARTH_RADIUS_KM)
+        # Longitude degrees shrink towards the poles, clamp to avoid dividing by zero
+        lon_delta = degrees(radius / (EARTH_RADIUS_KM * max(cos(radians(self.origin_lat)), 0.01)))
+        return {
+            "min_lat": self.origin_lat - lat_delta,
+            "max_lat": self.origin_lat + lat_delta,
+            "min_long": self.origin_long - lon_delta,
+            "max_long": self.origin_long + lon_delta,
+        }
+
+    def distances_from_origin(self, latitudes, longitudes):
+        """
+        Calculate the distance from the origin to many points in one pass.
+
+        Parameters:
+        latitudes, longitudes: Arrays of coordinates (in degrees).
+
+        Returns:
+        Array of distances in kilometers.
+        """
+        return batch_haversine(self.origin_lat, self.origin_long, latitudes, longitudes)
+
+    def distances_to(self, riders):
+        """
+        Calculate the distance from the origin to every rider in one pass.
+
+        Parameters:
+        riders: RiderSet or list of dictionaries with 'email' and 'location' keys.
+
+        Returns:
+        Array of distances in kilometers, in the order of riders.
+        """
+        riders = as_rider_set(riders)
+        return self.distances_from_origin(riders.lats, riders.longs)
+
     def destinations_within_radius(self, riders_locations, radius):
         """
         Find riders_locations within a specified radius of the origin.
 
         Parameters:
-        riders_locations: List of dictionaries, each containing 'email' and 'location' keys.
-                    'location' is a str containing 'longitude,latitude'.
+        riders_locations: RiderSet, or list of dictionaries each containing 'email' and
+                    'location' keys where 'location' is a str containing 'longitude,latitude'.
         radius: Radius in kilometers.
 
         Returns:
-        List of dictionaries for riders_locations within the specified radius of the origin.
+        The riders_locations within the specified radius of the origin, as a RiderSet
+        when a RiderSet was given and as a list of dictionaries otherwise.
+        """
+        riders = as_rider_set(riders_locations)
+        within_radius = riders.take(np.flatnonzero(self.distances_to(riders) <= radius))
+        if isinstance(riders_locations, RiderSet):
+            return within_radius
+        return within_radius.to_locations()
+
+    def nearest_destinations(self, riders_locations, k):
+        """
+        Select the k riders_locations closest to the origin by straight-line distance.
+
+        Parameters:
+        riders_locations: RiderSet, or list of dictionaries each containing 'email' and
+                    'location' keys where 'location' is a str containing 'longitude,latitude'.
+        k: Number of riders_locations to keep.
+
+        Returns:
+        At most k riders, closest first, in the same form as riders_locations.
         """
-        within_radius = []
-        for location in riders_locations:
-            lon, lat = map(float, location["location"].split(","))
-            distance = self.haversine_distance(
-                self.origin_lat, self.origin_long, lat, lon
-            )
-            if distance <= radius:
-                within_radius.append(
-                    {
-                        "email": location["email"],
-                        "location": "{},{}".format(lon, lat),
-                    }
-                )
-        return within_radius
+        riders = as_rider_set(riders_locations)
+        if not len(riders) or k <= 0:
+            return riders if isinstance(riders_locations, RiderSet) else []
+
+        distances = self.distances_to(riders)
+        if k < len(distances):
+            candidates = np.argpartition(distances, k - 1)[:k]
+        else:
+            candidates = np.arange(len(distances))
+        ranked = candidates[np.argsort(distances[candidates], kind="stable")]
+        if isinstance(riders_locations, RiderSet):
+            return riders.take(ranked)
+        return [riders_locations[i] for i in ranked.tolist()]
 
 
 def retry(ExceptionToCheck=Exception, tries=3, delay=1, backoff=2, logger=None):
@@ -1,8 +1,9 @@
 from django.db import transaction, IntegrityError
+from django.db.models.functions import Lower
 from django.contrib.auth import authenticate
 from django.utils import timezone
 from django.conf import settings
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 
 from accounts.paystack import PaystackServices
 from wallet.models import Wallet
@@ -14,6 +15,8 @@ from rest_framework import generics, status
 from .serializers import *
 from .models import *
 from .utils import create_on_table, send_verification_email
+from map_clients.rider_set import RiderSet
+from map_clients.rider_snapshot import rider_registry, shared_registry
 import logging
 
 
@@ -422,3 +425,95 @@ class UserPasswordResetView(APIView):
         return Response(
             {"detail": "Password reset successfully"}, status=status.HTTP_200_OK
         )
+
+
+class RiderLocationBatchView(APIView):
+    """
+    Ingest batches of location pings from the rider app.
+
+    Riders post their own buffered pings; staff users may post pings for
+    several riders at once (e.g. from a relay). Emails are matched without
+    regard to case. Only the latest ping per rider is kept, it only replaces a
+    stored position it is newer than, and all riders are written with a
+    single bulk upsert.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        pings = request.data.get("pings")
+        if not isinstance(pings, list) or not pings:
+            return Response(
+                {"detail": "A non-empty list of pings is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = RiderLocationPingSerializer(data=pings, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        now = timezone.now()
+        own_email = request.user.email.lower()
+        latest_pings = {}
+        for ping in serializer.validated_data:
+            email = ping.get("email", own_email).lower()
+            if email != own_email and not request.user.is_staff:
+                return Response(
+                    {"detail": "Riders can only report their own location"},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+            ping["recorded_at"] = ping.get("recorded_at", now)
+            current = latest_pings.get(email)
+            if current is None or ping["recorded_at"] >= current["recorded_at"]:
+                latest_pings[email] = ping
+
+        riders = {
+            rider.user.email.lower(): rider
+            for rider in Rider.objects.annotate(email_lower=Lower("user__email"))
+            .filter(email_lower__in=latest_pings)
+            .select_related("user")
+        }
+        with transaction.atomic():
+            # Pings can arrive out of order (retried or relayed batches); only
+            # a ping newer than the stored position replaces it
+            stored = dict(
+                RiderLocation.objects.select_for_update()
+                .filter(rider__in=riders.values())
+                .values_list("rider_id", "recorded_at")
+            )
+            locations = [
+                RiderLocation(
+                    rider=rider,
+                    current_lat=latest_pings[email]["lat"],
+                    current_long=latest_pings[email]["long"],
+                    recorded_at=latest_pings[email]["recorded_at"],
+                    updated_at=now,
+                )
+                for email, rider in riders.items()
+                if rider.pk not in stored or latest_pings[email]["recorded_at"] > stored[rider.pk]
+            ]
+            RiderLocation.objects.bulk_create(
+                locations,
+                update_conflicts=True,
+                unique_fields=["rider"],
+                update_fields=["current_lat", "current_long", "recorded_at", "updated_at"],
+            )
+        if shared_registry:
+            # Make the new positions visible to dispatch without waiting for the
+            # next sync, in one pipelined bulk upsert
+            rider_registry.bulk_load(
+                RiderSet(
+                    [location.rider.user.email for location in locations],
+                    [float(location.current_lat) for location in locations],
+                    [float(location.current_long) for location in locations],
+                )
+            )
+
+        return Response(
+            {
+                "detail": "Locations updated",
+                "updated": len(locations),
+                "stale": len(riders) - len(locations),
+                "unknown_riders": sorted(set(latest_pings) - set(riders)),
+            },
+            status=status.HTTP_200_OK,
+        )
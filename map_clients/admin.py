@@ -1,5 +1,13 @@
 from django.contrib import admin
-from map_clients.models import MapClientManager
+from map_clients.models import MapClientManager, RoutePair
 
 # Register your models here.
 admin.site.register(MapClientManager)
+
+
+class RoutePairAdmin(admin.ModelAdmin):
+    list_display = ['origin_cell', 'destination_cell', 'time_bucket', 'distance_m', 'duration_s', 'samples', 'updated_at']
+    search_fields = ['origin_cell', 'destination_cell']
+
+
+admin.site.register(RoutePair, RoutePairAdmin)
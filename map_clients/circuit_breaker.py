@@ -0,0 +1,146 @@
+import logging
+import time
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker with a rolling health score.
+
+    Calls, failures and slow calls are counted in buckets of ``bucket_seconds``
+    in the ``cache_alias`` Django cache, so every worker sharing it (the
+    SHARED_CACHE_ALIAS Redis when deployed) sees the same rolling window over the last ``window_seconds``. Once at least
+    ``min_calls`` calls are in the window and the share of failed or slow
+    calls reaches ``failure_threshold``, the circuit opens for
+    ``open_seconds``: callers skip the provider without waiting on it. After
+    that a single worker is let through to probe it (half-open); a success
+    closes the circuit and a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name,
+        failure_threshold=0.5,
+        min_calls=5,
+        slow_seconds=5.0,
+        window_seconds=60,
+        bucket_seconds=10,
+        open_seconds=30,
+        cache_alias="default",
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.slow_seconds = slow_seconds
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.open_seconds = open_seconds
+        self.cache_alias = cache_alias
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, *parts):
+        return ":".join(["circuit", self.name, *map(str, parts)])
+
+    def _bucket_keys(self, counter):
+        current = int(time.time() // self.bucket_seconds)
+        buckets = max(1, self.window_seconds // self.bucket_seconds)
+        return [self._key(counter, bucket) for bucket in range(current - buckets + 1, current + 1)]
+
+    def _count(self, counter):
+        key = self._bucket_keys(counter)[-1]
+        self.cache.add(key, 0, timeout=self.window_seconds + self.bucket_seconds)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # The bucket expired between add and incr
+            self.cache.set(key, 1, timeout=self.window_seconds + self.bucket_seconds)
+
+    def stats(self):
+        """Calls, failures and slow calls in the rolling window."""
+        keys = {counter: self._bucket_keys(counter) for counter in ("calls", "failures", "slow")}
+        values = self.cache.get_many([key for counter_keys in keys.values() for key in counter_keys])
+        return {
+            counter: sum(values.get(key, 0) for key in counter_keys)
+            for counter, counter_keys in keys.items()
+        }
+
+    def health(self):
+        """Share of calls in the window that were neither failed nor slow, 1.0 when idle."""
+        stats = self.stats()
+        if not stats["calls"]:
+            return 1.0
+        return max(0.0, 1 - (stats["failures"] + stats["slow"]) / stats["calls"])
+
+    @property
+    def state(self):
+        opened_until = self.cache.get(self._key("open_until"))
+        if opened_until is None:
+            return "closed"
+        if time.time() < opened_until:
+            return "open"
+        return "half_open"
+
+    def available(self):
+        """Whether the provider may be called, without claiming the half-open probe."""
+        return self.state != "open"
+
+    def allow_request(self):
+        """
+        Whether a call may go to the provider now. In the half-open state this
+        claims the single probe, so only call it right before the call.
+        """
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+        # Half-open: only the worker that claims the probe goes through
+        return self.cache.add(self._key("probe"), 1, timeout=self.open_seconds)
+
+    def record_success(self, latency):
+        self._count("calls")
+        slow = latency >= self.slow_seconds
+        if slow:
+            self._count("slow")
+        if self.state == "half_open":
+            if slow:
+                self._open()
+            else:
+                self._close()
+            return
+        self._trip_if_unhealthy()
+
+    def record_failure(self):
+        self._count("calls")
+        self._count("failures")
+        if self.state == "half_open":
+            self._open()
+            return
+        self._trip_if_unhealthy()
+
+    def _trip_if_unhealthy(self):
+        stats = self.stats()
+        if stats["calls"] < self.min_calls:
+            return
+        if (stats["failures"] + stats["slow"]) / stats["calls"] >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.cache.set(self._key("open_until"), time.time() + self.open_seconds, timeout=None)
+        self.cache.delete(self._key("probe"))
+        logger.warning(f"Circuit for {self.name} opened for {self.open_seconds}s")
+
+    def _close(self):
+        self.cache.delete_many(
+            [self._key("open_until"), self._key("probe")]
+            + self._bucket_keys("calls")
+            + self._bucket_keys("failures")
+            + self._bucket_keys("slow")
+        )
+        logger.info(f"Circuit for {self.name} closed")
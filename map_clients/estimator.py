@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.utils import DistanceCalculator
+from map_clients.rider_set import RiderSet
+from map_clients.routes import RouteLeg
+
+
+class TravelEstimator:
+    """
+    Road distance and travel time estimated from straight-line distance.
+
+    The haversine distance is multiplied by the road-detour factor of the zone
+    the origin falls in, and travel time comes from that zone's peak or
+    off-peak speed. Zones are bounding boxes from OFFLINE_ESTIMATOR_ZONES,
+    each calibrated by comparing provider routes with straight lines;
+    origins outside every zone use the defaults.
+    """
+
+    def __init__(
+        self,
+        zones=(),
+        detour_factor=1.4,
+        peak_speed_kmh=15.0,
+        off_peak_speed_kmh=25.0,
+        peak_hours=(),
+    ):
+        self.zones = list(zones)
+        self.detour_factor = detour_factor
+        self.peak_speed_kmh = peak_speed_kmh
+        self.off_peak_speed_kmh = off_peak_speed_kmh
+        self.peak_hours = set(peak_hours)
+
+    def zone_for(self, lat, lon):
+        for zone in self.zones:
+            if (
+                zone["min_lat"] <= lat <= zone["max_lat"]
+                and zone["min_long"] <= lon <= zone["max_long"]
+            ):
+                return zone
+        return {}
+
+    def speed_kmh(self, zone, when=None):
+        hour = timezone.localtime(when).hour
+        if hour in self.peak_hours:
+            return zone.get("peak_speed_kmh", self.peak_speed_kmh)
+        return zone.get("off_peak_speed_kmh", self.off_peak_speed_kmh)
+
+    def estimate(self, origin, riders, when=None):
+        """
+        Estimate road distance and travel time from the origin to every rider.
+
+        Returns:
+            Tuple of arrays (distances in km, durations in seconds), in rider order.
+        """
+        calculator = DistanceCalculator(origin)
+        zone = self.zone_for(calculator.origin_lat, calculator.origin_long)
+        distances = calculator.distances_to(riders) * zone.get("detour_factor", self.detour_factor)
+        durations = distances / self.speed_kmh(zone, when) * 3600
+        return distances, durations
+
+    def estimate_leg(self, origin, destination):
+        """Estimated route between two 'longitude,latitude' points, as an approximate RouteLeg."""
+        long, lat = map(float, destination.split(","))
+        distances, durations = self.estimate(origin, RiderSet([""], [lat], [long]))
+        return RouteLeg(float(distances[0]) * 1000, float(durations[0]), approximate=True)
+
+
+travel_estimator = TravelEstimator(
+    zones=settings.OFFLINE_ESTIMATOR_ZONES,
+    detour_factor=settings.OFFLINE_DETOUR_FACTOR,
+    peak_speed_kmh=settings.OFFLINE_PEAK_SPEED_KMH,
+    off_peak_speed_kmh=settings.OFFLINE_OFF_PEAK_SPEED_KMH,
+    peak_hours=settings.OFFLINE_PEAK_HOURS,
+)
@@ -0,0 +1,114 @@
+import copy
+import json
+import logging
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """The subset of the postgrest query builder SupabaseTransactions uses."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.fields = None
+        self.filters = []
+        self.action = "select"
+        self.payload = None
+
+    def select(self, *fields):
+        self.fields = None if "*" in fields else list(fields)
+        return self
+
+    def _filter(self, column, test):
+        self.filters.append((column, test))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda current: current == value)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(column, lambda current: current in values)
+
+    def gt(self, column, value):
+        return self._filter(column, lambda current: current is not None and current > value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda current: current is not None and current >= value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda current: current is not None and current <= value)
+
+    def like(self, column, pattern):
+        regex = re.compile(".*".join(re.escape(part) for part in pattern.split("%")), re.DOTALL)
+        return self._filter(column, lambda current: current is not None and regex.fullmatch(current) is not None)
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    def insert(self, values):
+        self.action, self.payload = "insert", values
+        return self
+
+    def _matches(self, row):
+        return all(test(row.get(column)) for column, test in self.filters)
+
+    def execute(self):
+        self.client.wait()
+        with self.client.lock:
+            rows = self.client.tables.setdefault(self.table, [])
+            if self.action == "insert":
+                new_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                rows.extend(copy.deepcopy(new_rows))
+                return FakeResponse(copy.deepcopy(new_rows))
+
+            matched = [row for row in rows if self._matches(row)]
+            if self.action == "update":
+                for row in matched:
+                    row.update(copy.deepcopy(self.payload))
+                return FakeResponse(copy.deepcopy(matched))
+
+            if self.fields is None:
+                return FakeResponse(copy.deepcopy(matched))
+            return FakeResponse([{field: row.get(field) for field in self.fields} for row in matched])
+
+
+class FakeSupabaseClient:
+    """
+    In-memory stand-in for the Supabase client.
+
+    Tables are seeded from ``fixture`` (a JSON object of table name to list of
+    rows, e.g. recorded from the real riders and customers tables) and every
+    query waits ``latency`` seconds and fails with ``error_rate`` probability,
+    so dispatch and notification flows can run offline.
+    """
+
+    def __init__(self, fixture=None, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.tables = {}
+        if fixture and Path(fixture).exists():
+            self.tables = json.loads(Path(fixture).read_text())
+        elif fixture:
+            logger.warning(f"Supabase fixture {fixture} not found, starting with empty tables")
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def wait(self):
+        time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise ConnectionError("Injected Supabase failure")
@@ -0,0 +1,52 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class LatencyTracker:
+    """Recent call latencies of one provider, for percentile-based hedge delays."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, q, default, min_samples=20):
+        """The ``q`` percentile of the recent latencies, or ``default`` until enough are seen."""
+        with self._lock:
+            samples = list(self._samples)
+        if len(samples) < min_samples:
+            return default
+        return float(np.percentile(samples, q))
+
+
+class HedgeBudget:
+    """
+    Caps hedged requests at a fraction of an endpoint's requests.
+
+    Every request earns ``ratio`` of a hedge, up to ``burst`` saved hedges,
+    and every hedge spends one, so an endpoint with a 0.1 budget sends at most
+    about one extra provider call per ten requests, even while a provider is
+    slow for everyone.
+    """
+
+    def __init__(self, ratio, burst=5):
+        self.ratio = ratio
+        self.burst = burst
+        self._credit = 0.0
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._credit = min(self.burst, self._credit + self.ratio)
+
+    def spend(self):
+        with self._lock:
+            if self._credit < 1:
+                return False
+            self._credit -= 1
+            return True
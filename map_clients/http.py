@@ -0,0 +1,36 @@
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from map_clients.replay import mount_replay
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session with keep-alive connection pools and a default timeout.
+
+    Every host gets its own pool that keeps up to ``pool_size`` connections
+    alive. When all of them are busy an extra connection is opened and closed
+    after use rather than waiting on the pool, which requests would do with
+    no timeout; the provider rate limiters bound how many calls are in flight.
+    """
+
+    def __init__(self, pool_size=10, timeout=10):
+        super().__init__()
+        self.timeout = timeout
+        pool = dict(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=False)
+        adapter = HTTPAdapter(**pool)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        # Offline runs answer from recorded responses instead (PROVIDER_REPLAY_MODE)
+        mount_replay(self, **pool)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+map_session = PooledSession(
+    pool_size=settings.MAP_HTTP_POOL_SIZE,
+    timeout=(settings.MAP_HTTP_CONNECT_TIMEOUT_SECONDS, settings.MAP_HTTP_READ_TIMEOUT_SECONDS),
+)
@@ -1,8 +1,23 @@
 from django.conf import settings
+from django.core.cache import cache
 import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import httpx
 import requests
-from accounts.utils import retry
+from accounts.utils import DistanceCalculator, retry
+from map_clients.circuit_breaker import CircuitBreaker
+from map_clients.estimator import travel_estimator
+from map_clients.hedging import HedgeBudget, LatencyTracker
+from map_clients.http import map_session
+from map_clients.matrix_cache import matrix_cache
+from map_clients.quota import quota_meter
+from map_clients.rate_limit import RateLimitExceeded, get_rate_limiter
 from map_clients.models import MapClientManager
+from map_clients.rider_set import RiderSet, as_rider_set
+from map_clients.route_store import route_store
+from map_clients.routes import RiderRoute, RouteLeg
+from map_clients.single_flight import single_flight
 
 from mapbox_distance_matrix.distance_matrix import MapboxDistanceDuration
 from tom_tom_map_api.distance_matrix import TomTomDistanceMatrix
@@ -15,12 +30,101 @@ class MapClients:
         self.api_key = api_key
         self.is_available = True
 
-    def get_distances_duration(self):
+    def get_distances_duration(self, origin, destination):
+        """
+        Get distances and durations from every rider to the origin.
+
+        Parameters:
+            origin (str): 'longitude,latitude' of the origin.
+            destination (RiderSet or list of dict): Riders to measure.
+
+        Returns:
+            list: RiderRoute (email and RouteLeg) of every rider with a route, in
+            rider order, or None if the provider call failed.
+        """
+        riders = as_rider_set(destination)
+        # Rider positions are one-off, so their legs are cached but not stored
+        matrix = self.get_matrix([rider.location for rider in riders], [origin], store=False)
+        if matrix is None:
+            return None
+        return [
+            RiderRoute(email, row[0])
+            for email, row in zip(riders.emails, matrix)
+            if row[0] is not None
+        ]
+
+    def get_matrix(self, sources, destinations, store=True):
+        """
+        Get distances and durations from every source to every destination,
+        serving the pairs found in the matrix cache, then in the route store,
+        and fetching only the sources and destinations that still have missing
+        pairs. Fetched pairs are written to the cache and, with ``store``, to
+        the route store.
+
+        Parameters:
+            sources (list of str): 'longitude,latitude' coordinates.
+            destinations (list of str): 'longitude,latitude' coordinates.
+            store (bool): Record fetched pairs in the route store; only for
+                pickup-to-recipient trips, which recur.
+
+        Returns:
+            list: One row per source with one cell per destination, each a
+            RouteLeg or None if there is no route; None if the provider call
+            failed.
+        """
+        keys = [[matrix_cache.key("leg", source, destination) for destination in destinations] for source in sources]
+        cached = matrix_cache.get_many([key for row in keys for key in row])
+
+        missing_pairs = {
+            keys[i][j]: (source, destination)
+            for i, source in enumerate(sources)
+            for j, destination in enumerate(destinations)
+            if keys[i][j] not in cached
+        }
+        if missing_pairs:
+            stored = route_store.get_many(list(set(missing_pairs.values())))
+            stored_values = {key: stored[pair] for key, pair in missing_pairs.items() if pair in stored}
+            matrix_cache.set_many(stored_values)
+            cached.update(stored_values)
+
+        missing_sources = [i for i, row in enumerate(keys) if any(key not in cached for key in row)]
+        if missing_sources:
+            missing_destinations = [
+                j for j in range(len(destinations))
+                if any(keys[i][j] not in cached for i in missing_sources)
+            ]
+            fetched = self.fetch_matrix(
+                [sources[i] for i in missing_sources],
+                [destinations[j] for j in missing_destinations],
+            )
+            if fetched is None:
+                return None
+            fetched_values = {
+                keys[i][j]: cell
+                for i, row in zip(missing_sources, fetched)
+                for j, cell in zip(missing_destinations, row)
+                if cell is not None
+            }
+            matrix_cache.set_many({key: cell for key, cell in fetched_values.items() if not cell.approximate})
+            if store:
+                route_store.save(
+                    {
+                        (sources[i], destinations[j]): cell
+                        for i, row in zip(missing_sources, fetched)
+                        for j, cell in zip(missing_destinations, row)
+                        if cell is not None
+                    }
+                )
+            cached.update(fetched_values)
+
+        return [[cached.get(key) for key in row] for row in keys]
+
+    def fetch_matrix(self, sources, destinations):
         raise NotImplementedError("Subclasses must implement this method")
 
     def handle_exceptions(self, exception):
-        if isinstance(exception, requests.exceptions.RequestException) or isinstance(
-            exception, FileNotFoundError
+        if isinstance(
+            exception, (requests.exceptions.RequestException, httpx.TransportError, FileNotFoundError)
         ):
             pass
         else:
@@ -34,29 +138,29 @@ class Mapbox(MapClients):
         super().__init__(api_key)
 
     @retry(
-        (requests.exceptions.RequestException, FileNotFoundError),
+        (requests.exceptions.RequestException, httpx.TransportError, FileNotFoundError),
         tries=3,
         delay=1,
         backoff=2,
         logger=logger,
     )
-    def get_distances_duration(
+    def fetch_matrix(
         self,
-        origin,
-        destination,
+        sources,
+        destinations,
     ):
         """
-        A method that uses retry decorator to make multiple attempts to get distances and durations between two locations using MapBox API.
+        A method that uses retry decorator to make multiple attempts to get distances and durations between locations using MapBox API.
 
-        :param origin: The origin of the distance calculation.
-        :type origin: str
-        :param destination: The destination of the distance calculation.
-        :type destination: str
-        :return: The get_distance_duration method of the mapbox client
+        :param sources: The starting locations.
+        :type sources: list
+        :param destinations: The destination locations.
+        :type destinations: list
+        :return: The get_matrix method of the mapbox client
         """
         try:
             mapbox = MapboxDistanceDuration(self.api_key)
-            return mapbox.get_distance_duration(origin, destination)
+            return mapbox.get_matrix(sources, destinations)
         except Exception as e:
             self.handle_exceptions(e)
 
@@ -74,33 +178,106 @@ class TomTom(MapClients):
         backoff=2,
         logger=logger,
     )
-    def get_distances_duration(
+    def fetch_matrix(
         self,
-        origin,
-        destination,
+        sources,
+        destinations,
     ):
         """
-        A method that uses retry decorator to make multiple attempts to get distances and durations between two locations using TomTom API.
+        A method that uses retry decorator to make multiple attempts to get distances and durations between locations using TomTom API.
 
         Parameters:
-            origin (str): The starting location.
-            destination (str): The destination location.
+            sources (list): The starting locations.
+            destinations (list): The destination locations.
 
         Returns:
-            func: the get_async_response method of the tomtom client
+            func: the get_matrix method of the tomtom client
         """
         try:
             tomtom = TomTomDistanceMatrix(self.api_key)
-            return tomtom.get_async_response(origin, destination)
+            return tomtom.get_matrix(sources, destinations)
         except Exception as e:
             self.handle_exceptions(e)
 
 
+class OfflineEstimator(MapClients):
+    """
+    Degraded-mode client that estimates distances and durations locally.
+
+    Used when every provider is failing or out of quota. Pairs in the matrix
+    cache or the route store are still served from there; the rest are marked
+    ``approximate`` and are never cached or stored.
+    """
+
+    def fetch_matrix(self, sources, destinations):
+        source_points = RiderSet.from_locations({"email": "", "location": source} for source in sources)
+        columns = []
+        for destination in destinations:
+            # Haversine is symmetric, so each column is the distance from the
+            # destination to every source
+            distances, durations = travel_estimator.estimate(destination, source_points)
+            columns.append(
+                [
+                    RouteLeg(distance * 1000, duration, approximate=True)
+                    for distance, duration in zip(distances.tolist(), durations.tolist())
+                ]
+            )
+        return [list(row) for row in zip(*columns)] if columns else [[] for _ in sources]
+
+
+class RoutedMapClient(MapClients):
+    """
+    Serves pairs from the matrix cache and the route store and fetches only
+    the missing ones, through the manager's breakers, hedging and fallback.
+    """
+
+    def __init__(self, manager, hedge_endpoint=None, critical=True):
+        super().__init__()
+        self.manager = manager
+        self.hedge_endpoint = hedge_endpoint
+        self.critical = critical
+
+    def fetch_matrix(self, sources, destinations):
+        return self.manager._route(
+            "fetch_matrix", (sources, destinations), self.hedge_endpoint, self.critical
+        )
+
+
 class MapClientsManager:
+    clients = {"tomtom": TomTom, "mapbox": Mapbox}
+    fallback_client = OfflineEstimator
+
     def __init__(self):
-        self.map_client_names = ["tomtom", "mapbox"]
-        self.map_client = MapClientManager()
-        self.client_name = self.map_client.current_map_client
+        self.map_client_names = list(self.clients)
+        self.breakers = {
+            name: CircuitBreaker(
+                name,
+                failure_threshold=settings.MAP_CIRCUIT_FAILURE_THRESHOLD,
+                min_calls=settings.MAP_CIRCUIT_MIN_CALLS,
+                slow_seconds=settings.MAP_CIRCUIT_SLOW_SECONDS,
+                window_seconds=settings.MAP_CIRCUIT_WINDOW_SECONDS,
+                open_seconds=settings.MAP_CIRCUIT_OPEN_SECONDS,
+                cache_alias=settings.MAP_CIRCUIT_CACHE_ALIAS,
+            )
+            for name in self.map_client_names
+        }
+        self.latencies = {name: LatencyTracker() for name in self.map_client_names}
+        self.hedge_budgets = {
+            endpoint: HedgeBudget(ratio) for endpoint, ratio in settings.MAP_HEDGE_BUDGETS.items()
+        }
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.MAP_HEDGE_MAX_WORKERS, thread_name_prefix="map-hedge"
+        )
+
+    @property
+    def client_name(self):
+        """The preferred client, as set on the MapClientManager row in the admin."""
+        name = cache.get("preferred_map_client")
+        if name is None:
+            preferred = MapClientManager.objects.first()
+            name = preferred.current_map_client if preferred else MapClientManager().current_map_client
+            cache.set("preferred_map_client", name, timeout=60)
+        return name
 
     def get_client(self, client_name=None):
         """
@@ -118,25 +295,182 @@ class MapClientsManager:
         if client_name is None:
             client_name = self.client_name
 
-        if client_name == "mapbox":
-            return Mapbox()
-        elif client_name == "tomtom":
-            return TomTom()
-        else:
+        if client_name not in self.clients:
             raise ValueError(f"Unknown client: {client_name}")
+        return self.clients[client_name]()
+
+    def ranked_clients(self):
+        """
+        Client names in the order to try them: healthiest first, the preferred
+        client winning ties.
+        """
+        preferred = self.client_name
+        return sorted(
+            self.map_client_names,
+            key=lambda name: (-self.breakers[name].health(), name != preferred),
+        )
+
+    def _call(self, name, method, *args):
+        """
+        Call one provider, recording the outcome on its breaker and, on success,
+        the latency used for its hedge delay; None on failure, or without a
+        call when its breaker does not let the request through.
+        """
+        if not self.breakers[name].allow_request():
+            return None
+        started = time.monotonic()
+        try:
+            results = getattr(self.get_client(name), method)(*args)
+        except Exception as e:
+            logger.error(f"Map client {name} failed: {str(e)}")
+            results = None
+        if results is None:
+            self.breakers[name].record_failure()
+            return None
+
+        latency = time.monotonic() - started
+        self.breakers[name].record_success(latency)
+        self.latencies[name].record(latency)
+        return results
+
+    def get_matrix_results(self, origin, destinations, hedge_endpoint=None, critical=True):
+        """
+        Fetch distances and durations from every rider to the origin.
+
+        Args:
+            origin (str): 'longitude,latitude' of the origin.
+            destinations (RiderSet or list of dict): Riders to measure.
+            hedge_endpoint (str, optional): Name of a latency-critical endpoint in
+                MAP_HEDGE_BUDGETS; its calls are hedged when MAP_HEDGING_ENABLED.
+            critical (bool): False for callers that can make do with cached or
+                estimated routes once quota runs low, e.g. tracking.
+
+        Returns:
+            list: RiderRoute (email and RouteLeg) of every rider with a route.
+            Concurrent calls for the same quantized origin and riders share one
+            provider request and its result.
+        """
+        riders = as_rider_set(destinations)
+        key = (
+            "get_distances_duration",
+            matrix_cache.point_key(origin),
+            tuple(riders.emails),
+            tuple(matrix_cache.point_key(rider.location) for rider in riders),
+            critical,
+        )
+        client = RoutedMapClient(self, hedge_endpoint, critical)
+        return single_flight.do(key, client.get_distances_duration, origin, riders)
+
+    def get_matrix(self, sources, destinations, hedge_endpoint=None, critical=True):
+        """
+        Fetch distances and durations from every source to every destination.
+
+        Args:
+            sources (list of str): 'longitude,latitude' coordinates.
+            destinations (list of str): 'longitude,latitude' coordinates.
+            hedge_endpoint (str, optional): See get_matrix_results.
+            critical (bool): See get_matrix_results.
 
-    def switch_client(self):
+        Returns:
+            list: One row per source with one cell per destination, each a
+            RouteLeg or None if there is no route. Concurrent calls for the
+            same quantized points share one provider request and its result.
         """
-        Switches to the next available client and saves the change.
+        key = (
+            "get_matrix",
+            tuple(matrix_cache.point_key(source) for source in sources),
+            tuple(matrix_cache.point_key(destination) for destination in destinations),
+            critical,
+        )
+        client = RoutedMapClient(self, hedge_endpoint, critical)
+        return single_flight.do(key, client.get_matrix, sources, destinations)
+
+    def _route(self, method, args, hedge_endpoint=None, critical=True):
         """
-        current_client = self.get_client()
-        if not current_client.is_available:
-            current_index = self.map_client_names.index(self.client_name)
-            next_index = (current_index + 1) % len(self.map_client_names)
-            next_client_name = self.map_client_names[next_index]
-            self.map_client.current_map_client = next_client_name
-            self.map_client.save()
-            logger.info(f"Switched to {next_client_name}, {self.client_name} is down")
+        Call ``method`` on the first provider whose circuit and quota allow it.
+
+        Only pairs missing from the matrix cache and the route store get here
+        (see RoutedMapClient), so breakers and latency trackers see real
+        provider calls only. Providers with an open circuit or a spent budget
+        (for non-critical callers, one past MAP_QUOTA_DEGRADE_AT) are skipped
+        without being called, and a provider that fails or returns nothing is
+        recorded on its breaker and the next one is tried. When none is left
+        the OfflineEstimator estimates the pairs, if
+        MAP_OFFLINE_FALLBACK_ENABLED or the caller is non-critical and was
+        held back by quota.
+
+        Raises:
+            Exception: If no provider returned results and the fallback is disabled.
+        """
+        in_budget = [name for name in self.ranked_clients() if quota_meter.allows(name, critical)]
+        held_back = len(in_budget) < len(self.map_client_names)
+        # The breakers are asked for the half-open probe only in _call, so a
+        # provider that is not called does not hold on to it
+        names = [name for name in in_budget if self.breakers[name].available()]
+
+        budget = self.hedge_budgets.get(hedge_endpoint)
+        if settings.MAP_HEDGING_ENABLED and budget is not None and len(names) > 1:
+            budget.earn()
+            results, called = self.get_hedged_results(method, args, names[0], names[1], budget)
+            if results is not None:
+                return results
+            names = [name for name in names if name not in called]
+
+        for name in names:
+            results = self._call(name, method, *args)
+            if results is not None:
+                return results
+            logger.error(f"Map client {name} failed, trying the next one")
+
+        if settings.MAP_OFFLINE_FALLBACK_ENABLED or (held_back and not critical):
+            logger.warning("No map client available, using offline estimates")
+            return getattr(self.fallback_client(), method)(*args)
+        raise Exception("No map client available (all providers failed, out of quota or circuits open)")
+
+    def get_hedged_results(self, method, args, primary, secondary, budget):
+        """
+        Send the request to ``primary`` and, if it has not answered within its
+        recent p95 latency and the endpoint budget allows, to ``secondary`` too.
+        When no hedge was sent and the primary fails, ``secondary`` is tried
+        afterwards as a normal failover.
+
+        Returns:
+            tuple: The first successful answer or None, and the names of the
+            providers that were called.
+        """
+        delay = self.latencies[primary].percentile(95, default=settings.MAP_HEDGE_DEFAULT_DELAY_SECONDS)
+        pending = {self.executor.submit(self._call, primary, method, *args)}
+
+        done, pending = wait(pending, timeout=delay)
+        if done:
+            results = done.pop().result()
+            if results is not None:
+                return results, [primary]
+            # The primary failed fast; fall back without spending the budget
+            return self._call(secondary, method, *args), [primary, secondary]
+
+        called = [primary]
+        if budget.spend():
+            logger.info(f"Hedging matrix request to {secondary} after {delay:.2f}s")
+            pending.add(self.executor.submit(self._call, secondary, method, *args))
+            called.append(secondary)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results = future.result()
+                if results is not None:
+                    # The slower call finishes in the background and still
+                    # records its outcome on its breaker
+                    return results, called
+
+        if secondary not in called:
+            # No hedge was sent, so the slow primary's failure fails over as usual
+            return self._call(secondary, method, *args), [primary, secondary]
+        return None, called
+
+
+map_clients_manager = MapClientsManager()
 
 
 # def get_distance(origin, destination):
@@ -167,24 +501,70 @@ def validate_coordinates(coordinates):
         return False
 
 
-def get_distance(origin, destination):
+def get_route_leg(origin, destination, critical=True):
+    """
+    Road route between two 'longitude,latitude' points, as a RouteLeg.
+
+    Served from the matrix cache or the route store when possible. Otherwise
+    the Mapbox Directions API is called, unless its quota is spent (for
+    non-critical callers such as quote refreshes, past MAP_QUOTA_DEGRADE_AT),
+    in which case the leg is estimated and marked ``approximate``.
+    """
+    key = matrix_cache.key("leg", origin, destination)
+    cached = matrix_cache.get_many([key])
+    if key in cached:
+        return cached[key]
+
+    # Road distance barely changes with traffic, so a stored route from any
+    # time of the week will do
+    stored = route_store.get_many([(origin, destination)], any_bucket=True)
+    if stored:
+        return stored[(origin, destination)]
+
+    if not quota_meter.allows("mapbox_directions", critical):
+        if critical and not settings.MAP_OFFLINE_FALLBACK_ENABLED:
+            raise ValueError("Unable to calculate distance. Please try again later.")
+        logger.warning("Directions quota low, using an offline distance estimate")
+        return travel_estimator.estimate_leg(origin, destination)
+
+    try:
+        leg = fetch_distance(origin, destination)
+    except ValueError:
+        if not settings.MAP_OFFLINE_FALLBACK_ENABLED:
+            raise
+        logger.warning("Directions unavailable, using an offline distance estimate")
+        return travel_estimator.estimate_leg(origin, destination)
+    matrix_cache.set_many({key: leg})
+    route_store.save({(origin, destination): leg})
+    return leg
+
+
+def get_distance(origin, destination, critical=True):
+    """Road distance in km between two 'longitude,latitude' points, see get_route_leg."""
+    return get_route_leg(origin, destination, critical).distance_km
+
+
+def fetch_distance(origin, destination):
+    """The Mapbox driving route between two 'longitude,latitude' points, as a RouteLeg."""
     api = settings.MAPBOX_API_KEY
     url = f"https://api.mapbox.com/directions/v5/mapbox/driving-traffic/{origin};{destination}?access_token={api}"
 
     try:
-        response = requests.get(url, timeout=10)  # Added timeout for reliability
+        get_rate_limiter("mapbox_directions").acquire(timeout=settings.RATE_LIMIT_TIMEOUT_SECONDS)
+        response = map_session.get(url)
         response.raise_for_status()  # Raise HTTPError for bad responses (4xx, 5xx)
+        quota_meter.record("mapbox_directions", 1)
 
         data = response.json()
         if "routes" in data and len(data["routes"]) > 0:
             distance = data["routes"][0].get("distance")
             if distance is not None:
-                return round(distance / 1000, 2)
+                return RouteLeg(distance, data["routes"][0].get("duration"))
             else:
                 raise ValueError("Distance data is missing in the API response.")
         else:
             raise ValueError("No valid routes found in the API response.")
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, RateLimitExceeded) as e:
         # Log the detailed error for debugging
         logger.error(f"Mapbox API error: {str(e)} | URL: {url}")
 
@@ -209,14 +589,15 @@ def validate_single_order(order):
         recipient_coords = f"{order['recipient_long']},{order['recipient_lat']}"
 
         # Calculate distance between pickup and recipient
-        distance_km = get_distance(pickup_coords, recipient_coords)
+        leg = get_route_leg(pickup_coords, recipient_coords)
 
         return {
             "status": "The delivery location is within the allowable distance.",
             "details": {
                 "recipient_name": order["recipient_name"],
                 "recipient_address": order["recipient_address"],
-                "distance_km": distance_km,
+                "distance_km": leg.distance_km,
+                "approximate": leg.approximate,
             },
         }
     except ValueError as e:
@@ -227,42 +608,129 @@ def validate_single_order(order):
         }
 
 
-def validate_distances(pickup_coords, destinations):
+def too_far_error(destination, distance_km, at_least=False):
+    return {
+        "recipient_name": destination["recipient_name"],
+        "recipient_address": destination["recipient_address"],
+        "distance_km": distance_km,
+        "message": (
+            f"This location is {'at least ' if at_least else ''}{distance_km} km away, exceeding the "
+            f"maximum allowable distance of {MAX_DISTANCE_KM} km."
+        ),
+    }
+
+
+def approximate_distance_warning(destination, distance_km):
+    return {
+        "recipient_name": destination["recipient_name"],
+        "recipient_address": destination["recipient_address"],
+        "distance_km": distance_km,
+        "approximate": True,
+        "message": (
+            f"This location is about {distance_km} km away by an offline estimate, exceeding the "
+            f"maximum allowable distance of {MAX_DISTANCE_KM} km; its road distance could not be checked."
+        ),
+    }
+
+
+def distance_failed_error(destination, error):
+    return {
+        "recipient_name": destination["recipient_name"],
+        "recipient_address": destination["recipient_address"],
+        # "distance_km": None,
+        "message": f"Failed to calculate distance. Error: {str(error)}"
+    }
+
+
+def batch_distance_errors(pickup_coords, destinations):
+    """
+    Check every destination against MAX_DISTANCE_KM with at most one matrix request.
+
+    A road is never shorter than the straight line, so a destination whose
+    haversine distance already exceeds the limit is rejected without asking
+    a provider. One within the limit even after multiplying by
+    ROUTE_DETOUR_UPPER_BOUND is accepted the same way. Only the remaining
+    destinations go to the matrix request.
+
+    An estimated (approximate) matrix cell over the limit is not proof the
+    road is too long, so it yields a warning instead of an error.
+
+    Returns:
+        tuple: (errors, warnings), each a list in destination order.
+    """
+    errors = {}
+    warnings = []
+    locations = [f"{destination['long']},{destination['lat']}" for destination in destinations]
+    straight_line = DistanceCalculator(pickup_coords).distances_to(
+        RiderSet.from_locations({"email": "", "location": location} for location in locations)
+    ).tolist()
+
+    uncertain = []
+    for index, (destination, distance) in enumerate(zip(destinations, straight_line)):
+        if distance > MAX_DISTANCE_KM:
+            errors[index] = too_far_error(destination, round(distance, 2), at_least=True)
+        elif distance * settings.ROUTE_DETOUR_UPPER_BOUND > MAX_DISTANCE_KM:
+            uncertain.append(index)
+
+    if not uncertain:
+        return [errors[index] for index in sorted(errors)], warnings
+
+    try:
+        row = map_clients_manager.get_matrix(
+            [pickup_coords], [locations[index] for index in uncertain]
+        )[0]
+    except Exception as e:
+        logger.error(f"Batch route validation failed: {str(e)}")
+        error = ValueError("Unable to calculate distance. Please try again later.")
+        for index in uncertain:
+            errors[index] = distance_failed_error(destinations[index], error)
+        return [errors[index] for index in sorted(errors)], warnings
+
+    for index, cell in zip(uncertain, row):
+        if cell is None:
+            errors[index] = distance_failed_error(destinations[index], ValueError("No valid routes found."))
+        elif cell.distance_km > MAX_DISTANCE_KM:
+            if cell.approximate:
+                warnings.append(approximate_distance_warning(destinations[index], cell.distance_km))
+            else:
+                errors[index] = too_far_error(destinations[index], cell.distance_km)
+    return [errors[index] for index in sorted(errors)], warnings
+
+
+def validate_distances(pickup_coords, destinations, batch=None):
     """
     Validate the distances between a pickup point and multiple destinations.
 
     Args:
         pickup_coords (str): Pickup point coordinates in "longitude,latitude" format.
         destinations (list): List of destination dictionaries with required fields.
+        batch (bool, optional): Check every destination with one matrix request
+            instead of a directions request each; defaults to ROUTE_VALIDATION_BATCH.
 
     Returns:
         dict: Summary of errors if any destination exceeds the maximum allowable distance.
+        Destinations only estimated to exceed it are accepted and listed under
+        "approximate_distances".
     """
-    errors = []
-
-    for destination in destinations:
-        try:
-            distance_km = get_distance(pickup_coords, f"{destination['long']},{destination['lat']}")
-            if distance_km > MAX_DISTANCE_KM:
-                errors.append({
-                    "recipient_name": destination["recipient_name"],
-                    "recipient_address": destination["recipient_address"],
-                    "distance_km": distance_km,
-                    "message": (
-                        f"This location is {distance_km} km away, exceeding the "
-                        f"maximum allowable distance of {MAX_DISTANCE_KM} km."
-                    ),
-                })
-        except ValueError as e:
-            errors.append({
-                "recipient_name": destination["recipient_name"],
-                "recipient_address": destination["recipient_address"],
-                # "distance_km": None,
-                "message": f"Failed to calculate distance. Error: {str(e)}"
-            })
+    if batch is None:
+        batch = settings.ROUTE_VALIDATION_BATCH
+    if batch:
+        errors, warnings = batch_distance_errors(pickup_coords, destinations)
+    else:
+        errors, warnings = [], []
+        for destination in destinations:
+            try:
+                leg = get_route_leg(pickup_coords, f"{destination['long']},{destination['lat']}")
+                if leg.distance_km > MAX_DISTANCE_KM:
+                    if leg.approximate:
+                        warnings.append(approximate_distance_warning(destination, leg.distance_km))
+                    else:
+                        errors.append(too_far_error(destination, leg.distance_km))
+            except ValueError as e:
+                errors.append(distance_failed_error(destination, e))
 
     if errors:
-        return {
+        result = {
             "error": "Some delivery locations are too far from the pickup point or delivery point.",
             "details": errors,
             "suggestion": (
@@ -270,4 +738,8 @@ def validate_distances(pickup_coords, destinations):
                 "destinations are within 5 km from the pickup point."
             ),
         }
-    return {"status": "All destinations are within the allowable distance."}
+    else:
+        result = {"status": "All destinations are within the allowable distance."}
+    if warnings:
+        result["approximate_distances"] = warnings
+    return result
@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class MatrixCache:
+    """
+    Cache of routing results keyed on quantized coordinates.
+
+    Both ends of a pair are snapped to a grid of ``precision`` degrees, so
+    riders a few metres apart, or the same pickup requested twice, share an
+    entry. Entries live in a bounded in-memory LRU and, when ``shared_alias``
+    names a Django cache, in that cache too so other processes can reuse them.
+    Every entry expires after ``ttl`` seconds because travel times follow
+    traffic.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300, precision=0.0005, shared_alias=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.precision = precision
+        self.shared_alias = shared_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def _snap(self, value):
+        return round(float(value) / self.precision)
+
+    def point_key(self, location):
+        """The grid cell of a 'longitude,latitude' point."""
+        long, lat = location.split(",")
+        return self._snap(lat), self._snap(long)
+
+    def key(self, kind, origin, destination):
+        """
+        Cache key of a pair.
+
+        Args:
+            kind (str): Namespace of the value, e.g. "leg" (RouteLeg cells).
+            origin (str): 'longitude,latitude'.
+            destination (str): 'longitude,latitude'.
+        """
+        origin_long, origin_lat = origin.split(",")
+        destination_long, destination_lat = destination.split(",")
+        return "route:{}:{}:{}:{}:{}".format(
+            kind,
+            self._snap(origin_lat),
+            self._snap(origin_long),
+            self._snap(destination_lat),
+            self._snap(destination_long),
+        )
+
+    def get_many(self, keys):
+        """Return a dict of the cached values found for ``keys``."""
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires, value = entry
+                if expires <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.shared is not None:
+            try:
+                remote = self.shared.get_many(missing)
+            except Exception as e:
+                logger.error(f"Matrix cache read failed: {str(e)}")
+                remote = {}
+            self._remember(remote)
+            found.update(remote)
+        return found
+
+    def set_many(self, values):
+        """Store a dict of key to value in memory and in the shared cache."""
+        if not values:
+            return
+        self._remember(values)
+        if self.shared is not None:
+            try:
+                self.shared.set_many(values, timeout=self.ttl)
+            except Exception as e:
+                logger.error(f"Matrix cache write failed: {str(e)}")
+
+    def _remember(self, values):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+matrix_cache = MatrixCache(
+    maxsize=settings.MATRIX_CACHE_MAX_ENTRIES,
+    ttl=settings.MATRIX_CACHE_TTL_SECONDS,
+    precision=settings.MATRIX_CACHE_PRECISION_DEGREES,
+    shared_alias=settings.MATRIX_CACHE_SHARED_ALIAS,
+)
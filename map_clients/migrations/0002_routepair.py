@@ -0,0 +1,30 @@
+# Generated by Django 4.1.6 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('map_clients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoutePair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin_cell', models.CharField(max_length=40)),
+                ('destination_cell', models.CharField(max_length=40)),
+                ('time_bucket', models.PositiveSmallIntegerField()),
+                ('distance_m', models.FloatField()),
+                ('duration_s', models.FloatField()),
+                ('samples', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='routepair',
+            constraint=models.UniqueConstraint(fields=('origin_cell', 'destination_cell', 'time_bucket'), name='unique_route_pair'),
+        ),
+    ]
@@ -6,3 +6,31 @@ class MapClientManager(models.Model):
 
     def __str__(self):
         return self.current_map_client
+
+
+class RoutePair(models.Model):
+    """
+    Road distance and travel time between two grid cells, averaged over every
+    provider response seen for the pair in one time-of-week bucket.
+
+    Cells are MatrixCache grid coordinates ('lat:long' of the snapped
+    point), so a row answers for every pickup and drop-off in the same cell.
+    """
+
+    origin_cell = models.CharField(max_length=40)
+    destination_cell = models.CharField(max_length=40)
+    time_bucket = models.PositiveSmallIntegerField()  # Hour of the week, in ROUTE_STORE_BUCKET_HOURS steps
+    distance_m = models.FloatField()
+    duration_s = models.FloatField()
+    samples = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["origin_cell", "destination_cell", "time_bucket"], name="unique_route_pair"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.origin_cell} -> {self.destination_cell} ({self.time_bucket})"
@@ -0,0 +1,116 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {
+    # Period: (label format, counter lifetime in seconds)
+    "day": ("%Y-%m-%d", 2 * 24 * 60 * 60),
+    "month": ("%Y-%m", 32 * 24 * 60 * 60),
+}
+
+
+class QuotaMeter:
+    """
+    Per-provider usage of the paid map APIs against daily and monthly budgets.
+
+    Requests and billed elements (origin-destination pairs for a matrix, one
+    per directions request) are counted per day and per month in the
+    ``cache_alias`` Django cache, so every worker sharing it adds to the same
+    counters; cost is derived from ``prices`` per 1000 elements. Budgets are
+    in elements, 0 meaning unlimited. A provider is closed to every caller
+    once a budget is spent, and to non-critical callers (quote refreshes,
+    tracking) from ``degrade_at`` of a budget, leaving them on cached,
+    stored or estimated routes.
+
+    Budgets are only enforced with a shared ``cache_alias``: counters in a
+    per-process cache would each see a fraction of the spend. Without one,
+    usage is still counted per process but every provider stays allowed.
+    """
+
+    def __init__(self, prices, daily_budgets, monthly_budgets, degrade_at=0.8, cache_alias=None):
+        self.prices = prices
+        self.budgets = {"day": daily_budgets, "month": monthly_budgets}
+        self.degrade_at = degrade_at
+        self.cache_alias = cache_alias
+        self.enforced = cache_alias is not None
+        if not self.enforced and any(any(budgets.values()) for budgets in self.budgets.values()):
+            logger.warning("Map quota budgets are set but no shared cache is configured; budgets are not enforced")
+
+    @property
+    def store(self):
+        return caches[self.cache_alias or "default"]
+
+    @staticmethod
+    def _key(provider, counter, period, when):
+        label_format, _ = PERIODS[period]
+        return f"quota:{provider}:{counter}:{when.strftime(label_format)}"
+
+    def record(self, provider, elements, requests=1):
+        """Count ``requests`` provider requests billing ``elements`` elements."""
+        now = timezone.now()
+        try:
+            for period, (_, lifetime) in PERIODS.items():
+                for counter, amount in (("elements", elements), ("requests", requests)):
+                    key = self._key(provider, counter, period, now)
+                    self.store.add(key, 0, timeout=lifetime)
+                    try:
+                        self.store.incr(key, amount)
+                    except ValueError:
+                        # The counter expired between add and incr
+                        self.store.set(key, amount, timeout=lifetime)
+        except Exception as e:
+            logger.error(f"Quota accounting failed for {provider}: {str(e)}")
+
+    async def arecord(self, provider, elements, requests=1):
+        """record() run in a worker thread, for callers on an event loop."""
+        await sync_to_async(self.record, thread_sensitive=False)(provider, elements, requests)
+
+    def usage(self, provider, period):
+        """Requests, elements, cost and budget of ``provider`` in the current day or month."""
+        now = timezone.now()
+        keys = {counter: self._key(provider, counter, period, now) for counter in ("requests", "elements")}
+        try:
+            values = self.store.get_many(list(keys.values()))
+        except Exception as e:
+            logger.error(f"Quota read failed for {provider}: {str(e)}")
+            values = {}
+        elements = values.get(keys["elements"], 0)
+        return {
+            "requests": values.get(keys["requests"], 0),
+            "elements": elements,
+            "cost": round(elements / 1000 * self.prices.get(provider, 0), 2),
+            "budget": self.budgets[period].get(provider, 0),
+        }
+
+    def stats(self):
+        """Usage of every priced provider, per period."""
+        return {provider: {period: self.usage(provider, period) for period in PERIODS} for provider in self.prices}
+
+    def utilisation(self, provider):
+        """The largest spent share of the provider's daily and monthly budgets, 0.0 without budgets."""
+        shares = [0.0]
+        for period in PERIODS:
+            usage = self.usage(provider, period)
+            if usage["budget"]:
+                shares.append(usage["elements"] / usage["budget"])
+        return max(shares)
+
+    def allows(self, provider, critical=True):
+        """Whether a critical or non-critical caller may still use ``provider``."""
+        if not self.enforced:
+            return True
+        return self.utilisation(provider) < (1.0 if critical else self.degrade_at)
+
+
+quota_meter = QuotaMeter(
+    prices=settings.MAP_QUOTA_PRICES,
+    daily_budgets=settings.MAP_QUOTA_DAILY_ELEMENTS,
+    monthly_budgets=settings.MAP_QUOTA_MONTHLY_ELEMENTS,
+    degrade_at=settings.MAP_QUOTA_DEGRADE_AT,
+    cache_alias=settings.MAP_QUOTA_CACHE_ALIAS,
+)
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import threading
+import time
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when no token became available before the timeout."""
+
+
+class LocalBucketBackend:
+    """Token buckets held in the current process."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, name, rate, capacity, tokens):
+        """Take ``tokens`` if available; return 0, or the seconds to wait before retrying."""
+        now = time.monotonic()
+        with self._lock:
+            available, updated = self._buckets.get(name, (capacity, now))
+            available = min(capacity, available + (now - updated) * rate)
+            if available >= tokens:
+                self._buckets[name] = (available - tokens, now)
+                return 0
+            self._buckets[name] = (available, now)
+            return (tokens - available) / rate
+
+    async def atake(self, name, rate, capacity, tokens):
+        # Only holds an in-process lock for a moment, so it is safe on the event loop
+        return self.take(name, rate, capacity, tokens)
+
+
+class RedisBucketBackend:
+    """
+    Token buckets stored in Redis and shared by every process using the same
+    server. Refill and take run in one Lua script so concurrent workers never
+    spend the same token twice.
+    """
+
+    script = """
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local requested = tonumber(ARGV[3])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= requested then
+        tokens = tokens - requested
+    else
+        wait = (requested - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    key_prefix = "rate_limit"
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+        self._take = self.client.register_script(self.script)
+
+    def take(self, name, rate, capacity, tokens):
+        return float(self._take(keys=[f"{self.key_prefix}:{name}"], args=[rate, capacity, tokens]))
+
+    async def atake(self, name, rate, capacity, tokens):
+        """take() run in a worker thread, so the Redis round trip does not block the event loop."""
+        return await sync_to_async(self.take, thread_sensitive=False)(name, rate, capacity, tokens)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` tokens per second up to ``capacity``.
+
+    Callers take one token per provider request. When the bucket is empty they
+    wait exactly as long as the refill needs instead of sleeping a fixed
+    interval, so the full quota is used and never exceeded.
+    """
+
+    def __init__(self, name, rate, capacity, backend):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.backend = backend
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Block until ``tokens`` are taken.
+
+        Raises:
+            RateLimitExceeded: If they could not be taken within ``timeout`` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.backend.take(self.name, self.rate, self.capacity, tokens)
+            if not wait:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(f"Rate limit of {self.name} exceeded")
+            time.sleep(wait)
+
+    async def aacquire(self, tokens=1, timeout=None):
+        """Async version of acquire that yields to the event loop while waiting."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = await self.backend.atake(self.name, self.rate, self.capacity, tokens)
+            if not wait:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(f"Rate limit of {self.name} exceeded")
+            await asyncio.sleep(wait)
+
+
+def build_backend():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisBucketBackend(settings.RATE_LIMIT_REDIS_URL)
+    return LocalBucketBackend()
+
+
+backend = build_backend()
+
+rate_limiters = {
+    name: TokenBucket(name, per_minute / 60, max(1, per_minute // 6), backend)
+    for name, per_minute in settings.PROVIDER_RATE_LIMITS.items()
+}
+
+
+def get_rate_limiter(name):
+    """The shared TokenBucket of a provider endpoint, e.g. "mapbox_matrix"."""
+    return rate_limiters[name]
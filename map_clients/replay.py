@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+SECRET_PARAMS = {"key", "access_token"}
+
+# Response fields holding personal data, blanked before a response is recorded:
+# Paystack customer, bank and card details, and rider emails and positions
+PII_FIELDS = {
+    "email", "rider_email", "customer_email", "first_name", "last_name", "phone", "phone_number",
+    "bvn", "account_number", "account_name", "bank_name", "authorization", "metadata",
+    "current_lat", "current_long", "lat", "long", "latitude", "longitude", "location", "point",
+}
+REDACTED = "[redacted]"
+
+
+def redact(value):
+    """A copy of a decoded JSON value with every PII_FIELDS entry blanked."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key in PII_FIELDS and item is not None else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+class Cassette:
+    """
+    Recorded provider responses, stored as one JSON line per response in a
+    ``<host>.jsonl`` file under ``directory``.
+
+    A request replays the response recorded for the same method, URL (minus
+    API keys) and body. Failing that it replays, in turn, the responses
+    recorded for the same route, with path segments holding coordinates, job
+    ids or emails treated as wildcards. Replayed responses wait for the
+    recorded latency times ``latency_scale`` and fail with ``error_rate``
+    probability, so flows can be load-tested offline with realistic timing.
+
+    Recordings hold no personal data: the exact key stores only a digest of
+    the path and query, which carry coordinates and emails, and JSON bodies
+    are recorded with PII_FIELDS blanked.
+    """
+
+    def __init__(self, directory, latency_scale=1.0, error_rate=0.0):
+        self.directory = Path(directory)
+        self.latency_scale = latency_scale
+        self.error_rate = error_rate
+        self._hosts = {}
+        self._turns = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _route(path):
+        return "/".join(
+            "*" if re.search(r"[\d@]", segment) else segment for segment in path.split("/")
+        )
+
+    def keys(self, method, url, body=b""):
+        """The exact and route keys of a request."""
+        parts = urlsplit(str(url))
+        query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in SECRET_PARAMS)
+        if isinstance(body, str):
+            body = body.encode()
+        target = hashlib.sha1(f"{parts.path}?{urlencode(query)}".encode()).hexdigest()
+        digest = hashlib.sha1(body or b"").hexdigest()
+        exact = f"{method} {target} {digest}"
+        return parts.hostname, exact, f"{method} {self._route(parts.path)}"
+
+    def _load(self, host):
+        if host not in self._hosts:
+            entries = {"exact": {}, "route": {}}
+            path = self.directory / f"{host}.jsonl"
+            if path.exists():
+                for line in path.read_text().splitlines():
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    entries["exact"][entry["exact"]] = entry
+                    entries["route"].setdefault(entry["route"], []).append(entry)
+            self._hosts[host] = entries
+        return self._hosts[host]
+
+    def find(self, method, url, body=b""):
+        host, exact, route = self.keys(method, url, body)
+        with self._lock:
+            entries = self._load(host)
+            if exact in entries["exact"]:
+                return entries["exact"][exact]
+            candidates = entries["route"].get(route)
+            if not candidates:
+                return None
+            turn = self._turns.get((host, route), 0)
+            self._turns[(host, route)] = turn + 1
+            return candidates[turn % len(candidates)]
+
+    @staticmethod
+    def _redact_body(content):
+        text = content.decode("utf-8", errors="replace")
+        try:
+            return json.dumps(redact(json.loads(text)))
+        except ValueError:
+            # Not JSON (e.g. an HTML error page), nothing structured to blank
+            return text
+
+    def record(self, method, url, body, status, headers, content, elapsed):
+        host, exact, route = self.keys(method, url, body)
+        entry = {
+            "exact": exact,
+            "route": route,
+            "status": status,
+            "headers": {"Content-Type": headers.get("Content-Type", "application/json")},
+            "body": self._redact_body(content),
+            "elapsed": elapsed,
+        }
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / f"{host}.jsonl", "a") as cassette:
+                cassette.write(json.dumps(entry) + "\n")
+            self._hosts.pop(host, None)
+
+    def delay(self, entry):
+        return entry["elapsed"] * self.latency_scale if entry else 0
+
+    def should_fail(self):
+        return random.random() < self.error_rate
+
+    @staticmethod
+    def missing(method, url):
+        logger.warning(f"No recorded response for {method} {urlsplit(str(url)).path}")
+        return {
+            "status": 501,
+            "headers": {"Content-Type": "application/json"},
+            "body": json.dumps({"error": "No recorded response"}),
+            "elapsed": 0,
+        }
+
+
+class ReplayAdapter(BaseAdapter):
+    """requests transport adapter that answers from a Cassette without network access."""
+
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        entry = self.cassette.find(request.method, request.url, request.body)
+        time.sleep(self.cassette.delay(entry))
+        if self.cassette.should_fail():
+            raise requests.exceptions.ConnectionError(f"Injected failure for {request.url}")
+        entry = entry or self.cassette.missing(request.method, request.url)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers.update(entry["headers"])
+        response._content = entry["body"].encode()
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(HTTPAdapter):
+    """requests transport adapter that records every live response to a Cassette."""
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        started = time.monotonic()
+        response = super().send(request, **kwargs)
+        self.cassette.record(
+            request.method, request.url, request.body, response.status_code,
+            response.headers, response.content, time.monotonic() - started,
+        )
+        return response
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """httpx transport that answers from a Cassette without network access."""
+
+    def __init__(self, cassette):
+        self.cassette = cassette
+
+    async def handle_async_request(self, request):
+        body = await request.aread()
+        entry = self.cassette.find(request.method, request.url, body)
+        await asyncio.sleep(self.cassette.delay(entry))
+        if self.cassette.should_fail():
+            raise httpx.ConnectError(f"Injected failure for {request.url}", request=request)
+        entry = entry or self.cassette.missing(request.method, request.url)
+        return httpx.Response(
+            entry["status"], headers=entry["headers"], content=entry["body"].encode(), request=request
+        )
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records every live response to a Cassette."""
+
+    def __init__(self, cassette, transport=None):
+        self.cassette = cassette
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        body = await request.aread()
+        started = time.monotonic()
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        self.cassette.record(
+            request.method, request.url, body, response.status_code,
+            response.headers, content, time.monotonic() - started,
+        )
+        return httpx.Response(
+            response.status_code, headers=response.headers, content=content, request=request
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+cassette = Cassette(
+    settings.PROVIDER_REPLAY_DIR,
+    latency_scale=settings.PROVIDER_REPLAY_LATENCY_SCALE,
+    error_rate=settings.PROVIDER_REPLAY_ERROR_RATE,
+)
+
+
+def mount_replay(session, **adapter_kwargs):
+    """Record or replay the traffic of a requests session, per PROVIDER_REPLAY_MODE."""
+    if settings.PROVIDER_REPLAY_MODE == "replay":
+        adapter = ReplayAdapter(cassette)
+    elif settings.PROVIDER_REPLAY_MODE == "record":
+        adapter = RecordingAdapter(cassette, **adapter_kwargs)
+    else:
+        return session
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def async_transport():
+    """The httpx transport to use per PROVIDER_REPLAY_MODE, or None for the default."""
+    if settings.PROVIDER_REPLAY_MODE == "replay":
+        return ReplayTransport(cassette)
+    if settings.PROVIDER_REPLAY_MODE == "record":
+        return RecordingTransport(cassette)
+    return None
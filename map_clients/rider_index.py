@@ -0,0 +1,205 @@
+import logging
+import sys
+from collections import defaultdict
+from math import ceil, cos, floor, radians
+
+import numpy as np
+
+from accounts.utils import DistanceCalculator
+from map_clients.rider_set import RiderSet, as_rider_set
+
+logger = logging.getLogger(__name__)
+
+KM_PER_DEGREE_LAT = 111.32
+
+
+class RiderGridIndex:
+    """
+    Uniform lat/long grid over rider positions.
+
+    Riders are bucketed into square cells of ``cell_km`` so that radius and
+    expanding searches only run the haversine check against riders in
+    the cells that overlap the search area instead of the whole fleet.
+    """
+
+    def __init__(self, riders_locations=None, cell_km=1.0):
+        self.cell_km = cell_km
+        self.cell_deg = cell_km / KM_PER_DEGREE_LAT
+        self.cells = defaultdict(dict)
+        self.rider_cells = {}
+        if riders_locations:
+            self.bulk_load(riders_locations)
+
+    def __len__(self):
+        return len(self.rider_cells)
+
+    def __contains__(self, email):
+        return email in self.rider_cells
+
+    def cell_for(self, lat, lon):
+        return floor(lat / self.cell_deg), floor(lon / self.cell_deg)
+
+    def bulk_load(self, riders_locations):
+        """
+        Add riders to the index.
+
+        Parameters:
+        riders_locations: RiderSet, or list of dictionaries each containing 'email' and
+                    'location' keys where 'location' is a str containing 'longitude,latitude'.
+        """
+        riders = as_rider_set(riders_locations)
+        for email, lat, lon in zip(riders.emails, riders.lats.tolist(), riders.longs.tolist()):
+            self.upsert(email, lat, lon)
+
+    def upsert(self, email, lat, lon):
+        """Insert a rider or move it to its new cell."""
+        email = sys.intern(email)
+        cell = self.cell_for(lat, lon)
+        previous = self.rider_cells.get(email)
+        if previous is not None and previous != cell:
+            self._discard(email, previous)
+        self.cells[cell][email] = (lat, lon)
+        self.rider_cells[email] = cell
+
+    def remove(self, email):
+        cell = self.rider_cells.pop(email, None)
+        if cell is not None:
+            self._discard(email, cell)
+
+    def get_riders(self, emails):
+        """RiderSet of the given riders that are in the index, in input order."""
+        found, lats, longs = [], [], []
+        for email in emails:
+            cell = self.rider_cells.get(email)
+            if cell is None:
+                continue
+            lat, lon = self.cells[cell][email]
+            found.append(email)
+            lats.append(lat)
+            longs.append(lon)
+        return RiderSet(found, lats, longs)
+
+    def _discard(self, email, cell):
+        bucket = self.cells.get(cell)
+        if bucket is None:
+            return
+        bucket.pop(email, None)
+        if not bucket:
+            del self.cells[cell]
+
+    def _lon_span(self, lat):
+        # Cells get narrower east-west away from the equator, so more of them
+        # are needed to cover the same distance.
+        return max(cos(radians(lat)), 0.01)
+
+    def _cells_within(self, center, rings, lon_factor):
+        """Yield every cell in the block ``rings`` cells around ``center``."""
+        row, col = center
+        lon_rings = ceil(rings / lon_factor)
+        for r in range(row - rings, row + rings + 1):
+            for c in range(col - lon_rings, col + lon_rings + 1):
+                yield r, c
+
+    def _ring(self, center, ring, lon_factor):
+        """Yield the cells added when the block grows from ``ring - 1`` to ``ring``."""
+        if ring == 0:
+            yield center
+            return
+        row, col = center
+        inner_lon = ceil((ring - 1) / lon_factor)
+        for r, c in self._cells_within(center, ring, lon_factor):
+            if abs(r - row) == ring or abs(c - col) > inner_lon:
+                yield r, c
+
+    def within_radius(self, origin, radius):
+        """
+        Find riders within a specified radius of the origin.
+
+        Parameters:
+        origin: str containing 'longitude,latitude'.
+        radius: Radius in kilometers.
+
+        Returns:
+        RiderSet of the riders within the radius.
+        """
+        calculator = DistanceCalculator(origin)
+        origin_lat = calculator.origin_lat
+        center = self.cell_for(origin_lat, calculator.origin_long)
+        rings = ceil(radius / self.cell_km)
+        lon_factor = self._lon_span(origin_lat)
+
+        emails, points = [], []
+        for cell in self._cells_within(center, rings, lon_factor):
+            bucket = self.cells.get(cell)
+            if bucket:
+                emails.extend(bucket.keys())
+                points.extend(bucket.values())
+        if not points:
+            return RiderSet()
+
+        latitudes, longitudes = np.array(points, dtype=float).T
+        riders = RiderSet(emails, latitudes, longitudes)
+        return riders.take(np.flatnonzero(calculator.distances_to(riders) <= radius))
+
+    def expanding_search(self, origin, target, start_radius, max_radius, growth=2, eligible=None):
+        """
+        Search outwards from the origin until ``target`` eligible riders are found.
+
+        The radius starts at ``start_radius`` and is multiplied by ``growth`` up
+        to ``max_radius``. Each step only scans the cells added by the larger
+        radius; riders already seen in the inner rings are reused.
+
+        Parameters:
+        origin: str containing 'longitude,latitude'.
+        target: Number of eligible riders that ends the search.
+        start_radius, max_radius: Radii in kilometers.
+        growth: Factor applied to the radius after each step.
+        eligible: Optional callable taking a list of emails and returning the set
+                  of those that may take the order. It is only called once per
+                  rider.
+
+        Returns:
+        Tuple (riders, radius): a RiderSet of the eligible riders within the
+        final radius, closest first, and the radius in kilometers the search
+        stopped at.
+        """
+        calculator = DistanceCalculator(origin)
+        origin_lat = calculator.origin_lat
+        center = self.cell_for(origin_lat, calculator.origin_long)
+        lon_factor = self._lon_span(origin_lat)
+
+        candidates = []  # (distance, email, lon, lat) of eligible riders seen so far
+        scanned_rings = -1
+        radius = min(start_radius, max_radius)
+        while True:
+            rings = ceil(radius / self.cell_km)
+            emails, points = [], []
+            for ring in range(scanned_rings + 1, rings + 1):
+                for cell in self._ring(center, ring, lon_factor):
+                    bucket = self.cells.get(cell)
+                    if bucket:
+                        emails.extend(bucket.keys())
+                        points.extend(bucket.values())
+            scanned_rings = max(scanned_rings, rings)
+
+            if points:
+                allowed = set(eligible(emails)) if eligible else set(emails)
+                latitudes, longitudes = np.array(points, dtype=float).T
+                distances = calculator.distances_from_origin(latitudes, longitudes)
+                candidates.extend(
+                    (distance, email, lon, lat)
+                    for email, (lat, lon), distance in zip(emails, points, distances.tolist())
+                    if email in allowed
+                )
+
+            found = [candidate for candidate in candidates if candidate[0] <= radius]
+            if len(found) >= target or radius >= max_radius:
+                break
+            radius = min(radius * growth, max_radius)
+
+        found.sort()
+        return RiderSet(
+            [email for _, email, _, _ in found],
+            [lat for _, _, _, lat in found],
+            [lon for _, _, lon, _ in found],
+        ), radius
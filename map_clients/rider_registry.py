@@ -0,0 +1,315 @@
+import logging
+import zlib
+from collections import defaultdict
+from math import floor
+
+import numpy as np
+import redis
+from django.conf import settings
+
+from accounts.utils import DistanceCalculator
+from map_clients.rider_index import RiderGridIndex
+from map_clients.rider_set import RiderSet, as_rider_set
+
+logger = logging.getLogger(__name__)
+
+
+class LocalShardBackend:
+    """Keeps every shard as a RiderGridIndex inside the current process."""
+
+    def __init__(self, cell_km=1.0):
+        self.cell_km = cell_km
+        self.shards = {}
+        self.directory = {}
+
+    def add(self, shard, email, lat, lon):
+        if shard not in self.shards:
+            self.shards[shard] = RiderGridIndex(cell_km=self.cell_km)
+        self.shards[shard].upsert(email, lat, lon)
+        self.directory[email] = shard
+
+    def bulk_upsert(self, entries):
+        """Add or move many riders, given as (shard, email, lat, lon) tuples."""
+        for shard, email, lat, lon in entries:
+            previous = self.directory.get(email)
+            if previous is not None and previous != shard:
+                self.discard(previous, email)
+            self.add(shard, email, lat, lon)
+
+    def discard(self, shard, email):
+        index = self.shards.get(shard)
+        if index is not None:
+            index.remove(email)
+            if not len(index):
+                del self.shards[shard]
+        if self.directory.get(email) == shard:
+            del self.directory[email]
+
+    def shard_of(self, email):
+        return self.directory.get(email)
+
+    def search(self, shard, origin, radius):
+        index = self.shards.get(shard)
+        if index is None:
+            return RiderSet()
+        return index.within_radius(origin, radius)
+
+    def locate(self, shard, emails):
+        index = self.shards.get(shard)
+        if index is None:
+            return RiderSet()
+        return index.get_riders(emails)
+
+    def count(self):
+        return len(self.directory)
+
+    def emails(self):
+        return list(self.directory)
+
+
+class RedisShardBackend:
+    """
+    Keeps every shard as a Redis GEO set.
+
+    Shards are spread over one or more Redis nodes by a stable hash of the
+    shard key, so cities can live on separate nodes and every web or Celery
+    worker queries only the nodes holding the shards it needs. The
+    rider-to-shard directory is spread over the nodes by a hash of the email.
+    """
+
+    key_prefix = "rider_registry"
+
+    def __init__(self, urls):
+        if not urls:
+            raise ValueError("RedisShardBackend needs at least one Redis URL")
+        self.nodes = [redis.Redis.from_url(url, decode_responses=True) for url in urls]
+
+    def _node_index(self, key):
+        return zlib.crc32(key.encode()) % len(self.nodes)
+
+    def _node(self, key):
+        return self.nodes[self._node_index(key)]
+
+    def _shard_key(self, shard):
+        return f"{self.key_prefix}:shard:{shard[0]}:{shard[1]}"
+
+    def _directory_key(self):
+        return f"{self.key_prefix}:directory"
+
+    def add(self, shard, email, lat, lon):
+        key = self._shard_key(shard)
+        self._node(key).geoadd(key, [lon, lat, email])
+        self._node(email).hset(self._directory_key(), email, key)
+
+    def bulk_upsert(self, entries):
+        """
+        Add or move many riders, given as (shard, email, lat, lon) tuples.
+
+        Current shards are read with one HMGET per node, and the writes are
+        sent as one pipeline per node, instead of several round trips per rider.
+        """
+        directory = self._directory_key()
+        emails_by_node = defaultdict(list)
+        for _, email, _, _ in entries:
+            emails_by_node[self._node_index(email)].append(email)
+        previous = {}
+        for index, emails in emails_by_node.items():
+            previous.update(zip(emails, self.nodes[index].hmget(directory, emails)))
+
+        pipelines = {}
+
+        def pipeline(key):
+            index = self._node_index(key)
+            if index not in pipelines:
+                pipelines[index] = self.nodes[index].pipeline(transaction=False)
+            return pipelines[index]
+
+        members = defaultdict(list)
+        for shard, email, lat, lon in entries:
+            key = self._shard_key(shard)
+            old_key = previous.get(email)
+            if old_key is not None and old_key != key:
+                pipeline(old_key).zrem(old_key, email)
+            members[key].extend([lon, lat, email])
+            pipeline(email).hset(directory, email, key)
+        for key, values in members.items():
+            pipeline(key).geoadd(key, values)
+        for node_pipeline in pipelines.values():
+            node_pipeline.execute()
+
+    def discard(self, shard, email):
+        key = self._shard_key(shard)
+        self._node(key).zrem(key, email)
+        directory = self._node(email)
+        if directory.hget(self._directory_key(), email) == key:
+            directory.hdel(self._directory_key(), email)
+
+    def shard_of(self, email):
+        key = self._node(email).hget(self._directory_key(), email)
+        if key is None:
+            return None
+        row, col = key.rsplit(":", 2)[-2:]
+        return int(row), int(col)
+
+    def search(self, shard, origin, radius):
+        key = self._shard_key(shard)
+        lon, lat = map(float, origin.split(","))
+        matches = self._node(key).geosearch(
+            key, longitude=lon, latitude=lat, radius=radius, unit="km", withcoord=True
+        )
+        return RiderSet(
+            [email for email, _ in matches],
+            [coord[1] for _, coord in matches],
+            [coord[0] for _, coord in matches],
+        )
+
+    def locate(self, shard, emails):
+        key = self._shard_key(shard)
+        positions = self._node(key).geopos(key, *emails)
+        found = [(email, pos) for email, pos in zip(emails, positions) if pos]
+        return RiderSet(
+            [email for email, _ in found],
+            [pos[1] for _, pos in found],
+            [pos[0] for _, pos in found],
+        )
+
+    def count(self):
+        return sum(node.hlen(self._directory_key()) for node in self.nodes)
+
+    def emails(self):
+        return [email for node in self.nodes for email in node.hkeys(self._directory_key())]
+
+
+class RiderRegistry:
+    """
+    Rider positions partitioned into geographic shards.
+
+    Each shard covers ``shard_degrees`` of latitude and longitude (about 55 km
+    at the default 0.5). A query only touches the shards overlapping the
+    bounding box of its search area, so adding cities adds shards instead of
+    growing every query. Shards are stored by a backend that may keep them in
+    the current process or on separate Redis nodes.
+    """
+
+    def __init__(self, backend, shard_degrees=0.5):
+        self.backend = backend
+        self.shard_degrees = shard_degrees
+
+    def __len__(self):
+        return self.backend.count()
+
+    def __contains__(self, email):
+        return self.backend.shard_of(email) is not None
+
+    def shard_for(self, lat, lon):
+        return floor(lat / self.shard_degrees), floor(lon / self.shard_degrees)
+
+    def shards_for_box(self, bounding_box):
+        min_row, min_col = self.shard_for(bounding_box["min_lat"], bounding_box["min_long"])
+        max_row, max_col = self.shard_for(bounding_box["max_lat"], bounding_box["max_long"])
+        return [
+            (row, col)
+            for row in range(min_row, max_row + 1)
+            for col in range(min_col, max_col + 1)
+        ]
+
+    def upsert(self, email, lat, lon):
+        """Insert a rider or move it to the shard of its new position."""
+        shard = self.shard_for(lat, lon)
+        previous = self.backend.shard_of(email)
+        if previous is not None and previous != shard:
+            self.backend.discard(previous, email)
+        self.backend.add(shard, email, lat, lon)
+
+    def bulk_load(self, riders_locations):
+        """Insert or move many riders, batched by the backend."""
+        riders = as_rider_set(riders_locations)
+        self.backend.bulk_upsert(
+            [
+                (self.shard_for(lat, lon), email, lat, lon)
+                for email, lat, lon in zip(riders.emails, riders.lats.tolist(), riders.longs.tolist())
+            ]
+        )
+
+    def emails(self):
+        """Every rider in the registry."""
+        return self.backend.emails()
+
+    def remove(self, email):
+        shard = self.backend.shard_of(email)
+        if shard is not None:
+            self.backend.discard(shard, email)
+
+    def within_radius(self, origin, radius):
+        """
+        Find riders within a specified radius of the origin.
+
+        Parameters:
+        origin: str containing 'longitude,latitude'.
+        radius: Radius in kilometers.
+
+        Returns:
+        RiderSet of the riders within the radius, closest first.
+        """
+        calculator = DistanceCalculator(origin)
+        shards = self.shards_for_box(calculator.bounding_box(radius))
+        riders = RiderSet.concat(
+            [self.backend.search(shard, origin, radius) for shard in shards]
+        )
+        distances = calculator.distances_to(riders)
+        inside = np.flatnonzero(distances <= radius)
+        return riders.take(inside[np.argsort(distances[inside], kind="stable")])
+
+    def expanding_search(self, origin, target, start_radius, max_radius, growth=2, eligible=None):
+        """
+        Search outwards from the origin until ``target`` eligible riders are found.
+
+        Candidates are fetched once from the shards overlapping ``max_radius``,
+        then the radius grows from ``start_radius`` by ``growth`` and each step
+        only checks eligibility of the riders it newly covers. See
+        RiderGridIndex.expanding_search for the parameters.
+
+        Returns:
+        Tuple (riders, radius): a RiderSet of the eligible riders within the
+        final radius, closest first, and the radius the search stopped at.
+        """
+        candidates = self.within_radius(origin, max_radius)
+        distances = DistanceCalculator(origin).distances_to(candidates)
+
+        allowed = []
+        checked = 0
+        radius = min(start_radius, max_radius)
+        while True:
+            covered = int(np.searchsorted(distances, radius, side="right"))
+            if covered > checked:
+                emails = candidates.emails[checked:covered]
+                permitted = set(eligible(emails)) if eligible else set(emails)
+                allowed.extend(
+                    i for i, email in enumerate(emails, start=checked) if email in permitted
+                )
+                checked = covered
+            if len(allowed) >= target or radius >= max_radius:
+                break
+            radius = min(radius * growth, max_radius)
+
+        return candidates.take(allowed), radius
+
+    def get_riders(self, emails):
+        """RiderSet of the given riders that are in the registry."""
+        by_shard = {}
+        for email in emails:
+            shard = self.backend.shard_of(email)
+            if shard is not None:
+                by_shard.setdefault(shard, []).append(email)
+        return RiderSet.concat(
+            [self.backend.locate(shard, shard_emails) for shard, shard_emails in by_shard.items()]
+        )
+
+
+def build_rider_registry():
+    """Create a RiderRegistry with the backend selected by RIDER_REGISTRY_BACKEND."""
+    if settings.RIDER_REGISTRY_BACKEND == "redis":
+        backend = RedisShardBackend(settings.RIDER_REGISTRY_REDIS_URLS)
+    else:
+        backend = LocalShardBackend(cell_km=settings.RIDER_INDEX_CELL_KM)
+    return RiderRegistry(backend, shard_degrees=settings.RIDER_SHARD_DEGREES)
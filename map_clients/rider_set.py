@@ -0,0 +1,111 @@
+import sys
+
+import numpy as np
+
+
+class RiderPoint:
+    """A single rider position."""
+
+    __slots__ = ("email", "lat", "long")
+
+    def __init__(self, email, lat, long):
+        self.email = email
+        self.lat = lat
+        self.long = long
+
+    @property
+    def location(self):
+        """The position as a 'longitude,latitude' string, as the map APIs expect."""
+        return "{},{}".format(self.long, self.lat)
+
+    def __repr__(self):
+        return f"RiderPoint({self.email!r}, {self.lat}, {self.long})"
+
+
+class RiderSet:
+    """
+    Compact collection of rider positions.
+
+    Latitudes and longitudes are stored in parallel float arrays and emails are
+    interned, so candidate lists can be filtered, ranked and sent to the map
+    APIs without building a dict and re-parsing a 'longitude,latitude' string
+    per rider.
+    """
+
+    __slots__ = ("emails", "lats", "longs", "_positions")
+
+    def __init__(self, emails=(), lats=(), longs=()):
+        self.emails = [sys.intern(email) for email in emails]
+        self.lats = np.asarray(lats, dtype=float).reshape(-1)
+        self.longs = np.asarray(longs, dtype=float).reshape(-1)
+        self._positions = None
+
+    @classmethod
+    def from_locations(cls, riders_locations):
+        """
+        Build a RiderSet from dictionaries with 'email' and 'location' keys,
+        'location' being a str containing 'longitude,latitude'.
+        """
+        emails, lats, longs = [], [], []
+        for rider in riders_locations:
+            lon, lat = rider["location"].split(",")
+            emails.append(rider["email"])
+            lats.append(float(lat))
+            longs.append(float(lon))
+        return cls(emails, lats, longs)
+
+    @classmethod
+    def concat(cls, rider_sets):
+        rider_sets = [riders for riders in rider_sets if len(riders)]
+        if not rider_sets:
+            return cls()
+        return cls(
+            [email for riders in rider_sets for email in riders.emails],
+            np.concatenate([riders.lats for riders in rider_sets]),
+            np.concatenate([riders.longs for riders in rider_sets]),
+        )
+
+    def __len__(self):
+        return len(self.emails)
+
+    def __iter__(self):
+        for email, lat, lon in zip(self.emails, self.lats.tolist(), self.longs.tolist()):
+            yield RiderPoint(email, lat, lon)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return RiderSet(self.emails[item], self.lats[item], self.longs[item])
+        return RiderPoint(self.emails[item], float(self.lats[item]), float(self.longs[item]))
+
+    def __contains__(self, email):
+        return email in self.positions
+
+    def __repr__(self):
+        return f"RiderSet({len(self)} riders)"
+
+    @property
+    def positions(self):
+        """Email to array index, built on first use."""
+        if self._positions is None:
+            self._positions = {email: i for i, email in enumerate(self.emails)}
+        return self._positions
+
+    def take(self, indices):
+        """A new RiderSet holding the riders at ``indices``, in that order."""
+        indices = np.asarray(indices, dtype=int).reshape(-1)
+        return RiderSet(
+            [self.emails[i] for i in indices.tolist()],
+            self.lats[indices],
+            self.longs[indices],
+        )
+
+    def to_locations(self):
+        """The riders as dictionaries with 'email' and 'location' keys."""
+        return [{"email": point.email, "location": point.location} for point in self]
+
+
+def as_rider_set(riders):
+    """Accept a RiderSet or a list of 'email'/'location' dictionaries."""
+    if isinstance(riders, RiderSet):
+        return riders
+    return RiderSet.from_locations(riders or [])
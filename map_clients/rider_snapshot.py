@@ -0,0 +1,277 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.models import RiderLocation
+from map_clients.rider_index import RiderGridIndex
+from map_clients.rider_registry import build_rider_registry
+from map_clients.rider_set import RiderSet
+from map_clients.supabase_query import UPDATE_TIME_FORMAT, SupabaseTransactions
+
+logger = logging.getLogger(__name__)
+
+
+class LocalRiderLocationSource:
+    """
+    Reads rider positions from the RiderLocation table filled by the rider app's
+    batched location endpoint, in the same row shape as the Supabase riders table.
+    The table has no online flag, so ``online_only`` is accepted but has no effect.
+    """
+
+    def get_rider_updates(self, since=None, online_only=False):
+        locations = RiderLocation.objects.select_related("rider__user")
+        if since:
+            # Rows are upserts, so re-reading the boundary second is harmless and
+            # avoids missing updates that share it.
+            since = timezone.make_aware(datetime.strptime(since, UPDATE_TIME_FORMAT))
+            locations = locations.filter(updated_at__gte=since)
+        return [
+            {
+                "rider_email": location.rider.user.email,
+                "current_lat": location.current_lat,
+                "current_long": location.current_long,
+                "update_time": timezone.localtime(location.updated_at).strftime(UPDATE_TIME_FORMAT),
+            }
+            for location in locations
+        ]
+
+
+class RiderLocationSnapshot:
+    """
+    Copy of rider positions kept in a rider index.
+
+    A daemon thread pulls only the riders whose ``update_time`` moved past the
+    last sync and applies them to the index. A full resync runs every
+    ``full_sync_interval`` seconds to drop deleted riders and to correct any
+    drift from comparing ``update_time`` values. With ``online_only`` riders
+    whose row says they are offline are left out or removed; a rider going
+    offline without a new ``update_time`` is only dropped by the next full
+    resync. The emails of riders last seen offline are kept in ``offline``.
+    Reads never serve data older than ``max_staleness`` seconds; if the
+    background thread falls behind the reader refreshes synchronously first.
+
+    ``index_factory`` builds the index a full resync loads into. It defaults
+    to a process-local RiderGridIndex; it may also return a RiderRegistry,
+    including a shared one that other processes read directly. When the
+    factory hands back the index already in use, as with the shared registry,
+    a full resync removes the riders missing from the source instead.
+    """
+
+    def __init__(
+        self,
+        source,
+        refresh_interval=5,
+        max_staleness=30,
+        full_sync_interval=300,
+        index_factory=RiderGridIndex,
+        online_only=False,
+    ):
+        self.source = source
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.full_sync_interval = full_sync_interval
+        self.index_factory = index_factory
+        self.online_only = online_only
+
+        self.index = index_factory()
+        self.offline = frozenset()
+        self.watermark = None
+        self.last_sync = 0.0
+        self.last_full_sync = 0.0
+
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def age(self):
+        return time.monotonic() - self.last_sync
+
+    def is_fresh(self):
+        return self.last_sync and self.age <= self.max_staleness
+
+    def start(self):
+        """Start the background refresh thread once per process."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="rider-location-snapshot", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Rider snapshot refresh failed: {str(e)}")
+            time.sleep(self.refresh_interval)
+
+    def refresh(self, full=False):
+        """
+        Pull rider changes from the source and apply them to the index.
+
+        The network call runs outside the read lock so lookups keep being
+        served from the current index while a sync is in flight.
+
+        Args:
+            full (bool): Reload every rider instead of only the changed ones.
+        """
+        with self._sync_lock:
+            full = full or time.monotonic() - self.last_full_sync >= self.full_sync_interval
+            rows = self.source.get_rider_updates(
+                since=None if full else self.watermark, online_only=self.online_only
+            )
+            if rows is None:
+                # The fetch failed; keep serving the current index and let the
+                # next refresh retry instead of swapping in an empty one
+                return
+
+            with self._lock:
+                index = self.index_factory() if full else self.index
+                watermark = None if full else self.watermark
+                known_offline = set() if full else set(self.offline)
+                emails, lats, longs, offline = [], [], [], []
+                for row in rows:
+                    email = row.get("rider_email")
+                    lat, lon = row.get("current_lat"), row.get("current_long")
+                    if not email or lat is None or lon is None:
+                        continue
+                    watermark = self._latest(watermark, row.get("update_time"))
+                    if self.online_only and "is_online" in row and not row["is_online"]:
+                        offline.append(email)
+                        continue
+                    emails.append(email)
+                    lats.append(float(lat))
+                    longs.append(float(lon))
+                index.bulk_load(RiderSet(emails, lats, longs))
+                for email in offline:
+                    index.remove(email)
+                known_offline.difference_update(emails)
+                known_offline.update(offline)
+
+                if full and index is self.index:
+                    # A reused index (the shared registry) still holds riders
+                    # deleted or gone offline since the last full sync
+                    for email in set(index.emails()) - set(emails):
+                        index.remove(email)
+
+                self.index = index
+                self.offline = frozenset(known_offline)
+                self.watermark = watermark
+                self.last_sync = time.monotonic()
+                if full:
+                    self.last_full_sync = self.last_sync
+
+    @staticmethod
+    def _latest(current, candidate):
+        if not candidate:
+            return current
+        try:
+            parsed = datetime.strptime(candidate, UPDATE_TIME_FORMAT)
+        except (TypeError, ValueError):
+            return current
+        if current is None or parsed > datetime.strptime(current, UPDATE_TIME_FORMAT):
+            return candidate
+        return current
+
+    def _ensure_fresh(self):
+        self.start()
+        if not self.is_fresh():
+            self.refresh()
+
+    def within_radius(self, origin, radius):
+        """Riders within ``radius`` km of ``origin``, see RiderGridIndex.within_radius."""
+        self._ensure_fresh()
+        with self._lock:
+            return self.index.within_radius(origin, radius)
+
+    def expanding_search(self, origin, target, start_radius, max_radius, growth=2, eligible=None):
+        """Grow the radius until ``target`` riders are found, see RiderGridIndex.expanding_search."""
+        self._ensure_fresh()
+        with self._lock:
+            return self.index.expanding_search(
+                origin, target, start_radius, max_radius, growth=growth, eligible=eligible
+            )
+
+    def get_riders(self, emails):
+        """
+        Look up the current location of specific riders.
+
+        Args:
+            emails (list): Rider emails.
+
+        Returns:
+            RiderSet of the riders found.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return self.index.get_riders(emails)
+
+
+supabase = SupabaseTransactions()
+
+# With the Redis backend the registry is shared: the sync_rider_registry task
+# keeps it current and dispatch queries read it directly. Otherwise every
+# process loads its own sharded registry through the snapshot.
+rider_registry = build_rider_registry()
+shared_registry = settings.RIDER_REGISTRY_BACKEND == "redis"
+
+rider_snapshot = RiderLocationSnapshot(
+    LocalRiderLocationSource() if settings.RIDER_LOCATION_SOURCE == "local" else supabase,
+    refresh_interval=settings.RIDER_SNAPSHOT_REFRESH_SECONDS,
+    max_staleness=settings.RIDER_SNAPSHOT_MAX_STALENESS_SECONDS,
+    full_sync_interval=settings.RIDER_SNAPSHOT_FULL_SYNC_SECONDS,
+    index_factory=(lambda: rider_registry) if shared_registry else build_rider_registry,
+    online_only=settings.RIDER_ONLINE_FILTER,
+)
+
+
+def get_dispatch_index():
+    """
+    The rider index dispatch queries run against, or None when riders should
+    be queried from Supabase directly.
+    """
+    if shared_registry:
+        return rider_registry
+    if settings.RIDER_SNAPSHOT_ENABLED:
+        return rider_snapshot
+    return None
+
+
+def get_rider_locations(emails):
+    """
+    Current locations of specific riders.
+
+    Riders are read from the dispatch index when there is one; the riders it
+    has not seen yet (e.g. registered after the last sync) are fetched from
+    Supabase with one query. With RIDER_ONLINE_FILTER that query only returns
+    online riders, and riders the snapshot last saw offline are not queried.
+
+    Args:
+        emails (list): Rider emails.
+
+    Returns:
+        RiderSet of the riders found.
+    """
+    index = get_dispatch_index()
+    riders = index.get_riders(emails) if index is not None else RiderSet()
+    offline = rider_snapshot.offline if index is rider_snapshot else frozenset()
+    missing = [
+        email for email in dict.fromkeys(emails) if email not in riders and email not in offline
+    ]
+    if not missing:
+        return riders
+
+    fields = ["rider_email", "current_lat", "current_long"]
+    found = supabase.get_supabase_riders(
+        fields=fields, online_only=settings.RIDER_ONLINE_FILTER, emails=missing
+    )
+    if not found:
+        return riders
+    return RiderSet.concat([riders, RiderSet.from_locations(found)])
@@ -0,0 +1,157 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from map_clients.matrix_cache import matrix_cache
+from map_clients.models import RoutePair
+from map_clients.routes import RouteLeg
+
+logger = logging.getLogger(__name__)
+
+
+class RouteStore:
+    """
+    Database-backed route cache that survives restarts, sitting behind the
+    in-memory MatrixCache.
+
+    Pairs are keyed on the MatrixCache grid cells of both ends and on the
+    time-of-week bucket, since the same merchant-to-neighbourhood trip takes
+    longer at rush hour. Every provider response is averaged into its row,
+    and rows not refreshed within ``max_age_days`` are ignored until the
+    prune_route_store task deletes them. Only pickup-to-recipient trips are
+    stored; rider legs start from a different point every time.
+    """
+
+    def __init__(self, enabled=True, bucket_hours=1, max_age_days=30):
+        self.enabled = enabled
+        self.bucket_hours = bucket_hours
+        self.max_age_days = max_age_days
+
+    def bucket(self, when=None):
+        """Time-of-week bucket of ``when`` (default now), in local time."""
+        local = timezone.localtime(when)
+        return (local.weekday() * 24 + local.hour) // self.bucket_hours
+
+    @staticmethod
+    def cell(location):
+        """The grid cell of a 'longitude,latitude' point, as stored in RoutePair."""
+        return "{}:{}".format(*matrix_cache.point_key(location))
+
+    def get_many(self, pairs, any_bucket=False):
+        """
+        Look up stored legs.
+
+        Args:
+            pairs (list): (origin, destination) tuples of 'longitude,latitude' strings.
+            any_bucket (bool): Accept a row from any time of the week, e.g. when
+                only the distance is needed. The row with most samples wins.
+
+        Returns:
+            dict: RouteLeg per pair found.
+        """
+        if not self.enabled or not pairs:
+            return {}
+        cells = {pair: (self.cell(pair[0]), self.cell(pair[1])) for pair in pairs}
+        rows = RoutePair.objects.filter(
+            origin_cell__in={origin for origin, _ in cells.values()},
+            destination_cell__in={destination for _, destination in cells.values()},
+            updated_at__gte=timezone.now() - timedelta(days=self.max_age_days),
+        )
+        if not any_bucket:
+            rows = rows.filter(time_bucket=self.bucket())
+
+        try:
+            found = {}
+            for row in rows.order_by("samples"):
+                found[(row.origin_cell, row.destination_cell)] = RouteLeg(row.distance_m, row.duration_s)
+        except Exception as e:
+            logger.error(f"Route store read failed: {str(e)}")
+            return {}
+        return {pair: found[cell_pair] for pair, cell_pair in cells.items() if cell_pair in found}
+
+    def record_many(self, legs, when=None):
+        """
+        Average provider legs into their rows.
+
+        Args:
+            legs (list): (origin cell, destination cell, distance_m, duration_s) tuples,
+                as built by ``rows``.
+            when (datetime, optional): When the legs were measured; defaults to now.
+        """
+        if not self.enabled or not legs:
+            return
+        bucket = self.bucket(when)
+        with transaction.atomic():
+            existing = {
+                (row.origin_cell, row.destination_cell): row
+                for row in RoutePair.objects.select_for_update().filter(
+                    origin_cell__in={leg[0] for leg in legs},
+                    destination_cell__in={leg[1] for leg in legs},
+                    time_bucket=bucket,
+                )
+            }
+            new_rows = {}
+            for origin_cell, destination_cell, distance_m, duration_s in legs:
+                key = (origin_cell, destination_cell)
+                row = existing.get(key)
+                if row is None and key not in new_rows:
+                    new_rows[key] = RoutePair(
+                        origin_cell=origin_cell,
+                        destination_cell=destination_cell,
+                        time_bucket=bucket,
+                        distance_m=distance_m,
+                        duration_s=duration_s,
+                    )
+                    continue
+                row = row or new_rows[key]
+                # Running mean, so a pair keeps converging as responses arrive
+                row.distance_m = (row.distance_m * row.samples + distance_m) / (row.samples + 1)
+                row.duration_s = (row.duration_s * row.samples + duration_s) / (row.samples + 1)
+                row.samples += 1
+                row.updated_at = timezone.now()
+
+            RoutePair.objects.bulk_update(
+                existing.values(), ["distance_m", "duration_s", "samples", "updated_at"]
+            )
+            # A row another worker created meanwhile keeps its values; the pair
+            # is averaged in from the next response
+            RoutePair.objects.bulk_create(new_rows.values(), ignore_conflicts=True)
+
+    def prune(self):
+        """Delete rows not refreshed within ``max_age_days``; returns how many."""
+        cutoff = timezone.now() - timedelta(days=self.max_age_days)
+        deleted, _ = RoutePair.objects.filter(updated_at__lt=cutoff).delete()
+        return deleted
+
+    def rows(self, legs):
+        """
+        Turn {(origin, destination): RouteLeg} into JSON-friendly rows for
+        record_many, leaving out approximate legs and legs without a duration.
+        """
+        return [
+            (self.cell(origin), self.cell(destination), leg.distance_m, leg.duration_s)
+            for (origin, destination), leg in legs.items()
+            if not leg.approximate and leg.duration_s is not None
+        ]
+
+    def save(self, legs):
+        """Queue provider legs to be recorded, off the request path."""
+        rows = self.rows(legs)
+        if not self.enabled or not rows:
+            return
+        from map_clients.tasks import record_route_pairs
+
+        try:
+            record_route_pairs.delay(rows, timezone.now().isoformat())
+        except Exception as e:
+            logger.error(f"Could not queue route pairs: {str(e)}")
+
+
+route_store = RouteStore(
+    enabled=settings.ROUTE_STORE_ENABLED,
+    bucket_hours=settings.ROUTE_STORE_BUCKET_HOURS,
+    max_age_days=settings.ROUTE_STORE_MAX_AGE_DAYS,
+)
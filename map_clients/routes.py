@@ -0,0 +1,53 @@
+from collections import namedtuple
+
+
+class RouteLeg(namedtuple("RouteLeg", ["distance_m", "duration_s", "approximate"], defaults=(False,))):
+    """
+    Road distance in meters and travel time in seconds of one matrix cell.
+
+    Adapters and the matrix cache keep these numbers as they are, so riders
+    can be ranked by ETA and legs summed without parsing text; they are only
+    turned into 'km' and '5 mins 3 secs' strings by RiderRouteSerializer and
+    format_duration at the API and notification edge.
+    """
+
+    __slots__ = ()
+
+    @property
+    def distance_km(self):
+        return round(self.distance_m / 1000, 2)
+
+    @classmethod
+    def total(cls, legs):
+        """The leg covering ``legs`` one after another."""
+        legs = list(legs)
+        return cls(
+            sum(leg.distance_m for leg in legs),
+            sum(leg.duration_s for leg in legs),
+            any(leg.approximate for leg in legs),
+        )
+
+
+# One rider's leg to the origin, as returned by MapClients.get_distances_duration
+RiderRoute = namedtuple("RiderRoute", ["email", "leg"])
+
+
+def format_duration(duration):
+    """
+    Format a duration in seconds into a human-readable format.
+
+    Parameters:
+        duration (int or float): The duration in seconds.
+
+    Returns:
+        str: The formatted duration string.
+    """
+    duration = round(duration)
+    duration_minutes, duration_seconds = divmod(duration, 60)
+
+    if duration <= 60:
+        return f"{duration} secs"
+    elif duration_seconds == 0:
+        return f"{duration_minutes} minutes"
+    else:
+        return f"{duration_minutes} mins {duration_seconds} secs"
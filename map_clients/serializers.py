@@ -0,0 +1,21 @@
+from rest_framework import serializers
+
+from map_clients.routes import format_duration
+
+
+class RiderRouteSerializer(serializers.Serializer):
+    """
+    Serializer for a RiderRoute: the rider's distance in km and formatted
+    duration, as shown to users and in notifications, plus the raw meters and
+    seconds for clients that sort or sum them.
+    """
+
+    email = serializers.EmailField()
+    distance = serializers.FloatField(source="leg.distance_km")
+    duration = serializers.SerializerMethodField()
+    distance_m = serializers.FloatField(source="leg.distance_m")
+    duration_s = serializers.FloatField(source="leg.duration_s")
+    approximate = serializers.BooleanField(source="leg.approximate")
+
+    def get_duration(self, route):
+        return format_duration(route.leg.duration_s)
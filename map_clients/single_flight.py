@@ -0,0 +1,60 @@
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls within a process.
+
+    The first caller for a key runs the call; callers arriving with the same
+    key while it is in flight wait for its result (or exception) instead of
+    repeating the Supabase or provider request. The result is shared between
+    them, so it must not be mutated. A waiter that has waited ``timeout``
+    seconds gives up and makes the call itself.
+    """
+
+    def __init__(self, enabled=True, timeout=30.0):
+        self.enabled = enabled
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+
+        if not leader:
+            try:
+                return call.result(timeout=self.timeout)
+            except TimeoutError:
+                logger.warning(f"Coalesced call {key[0]} still running after {self.timeout}s, calling directly")
+                return func(*args, **kwargs)
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+single_flight = SingleFlight(
+    enabled=settings.SINGLE_FLIGHT_ENABLED,
+    timeout=settings.SINGLE_FLIGHT_TIMEOUT_SECONDS,
+)
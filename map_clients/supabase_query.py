@@ -1,13 +1,19 @@
 from celery import shared_task
-from datetime import datetime
+from datetime import datetime, timedelta
 from django.conf import settings
 import logging
 from supabase import create_client
+
+from map_clients.fake_supabase import FakeSupabaseClient
+from map_clients.single_flight import single_flight
 from typing import List, Dict, Optional
 
 
 logger = logging.getLogger(__name__)
 
+# Text format of the riders table's update_time column
+UPDATE_TIME_FORMAT = "%m/%d/%Y,%H:%M:%S"
+
 
 class SupabaseTransactions:
     # Class attributes for Supabase URL and key
@@ -15,15 +21,57 @@ class SupabaseTransactions:
     supabase_key = settings.SUPABASE_KEY
     riders_table = "riders"
     customers_table = "customers"
+    rider_online_column = "is_online"
+    # Older watermarks are synced with a full fetch instead of one query per day
+    update_sync_max_days = 7
 
     def __init__(self):
-        self.supabase = create_client(self.supabase_url, self.supabase_key)
+        if settings.SUPABASE_BACKEND == "fake":
+            self.supabase = FakeSupabaseClient(
+                fixture=settings.SUPABASE_FAKE_FIXTURE,
+                latency=settings.SUPABASE_FAKE_LATENCY_SECONDS,
+                error_rate=settings.PROVIDER_REPLAY_ERROR_RATE,
+            )
+        else:
+            self.supabase = create_client(self.supabase_url, self.supabase_key)
 
     def get_supabase_riders(
         self,
         conditions: Optional[List[Dict[str, str]]] = None,
         fields: Optional[List[str]] = None,
+        bounding_box: Optional[Dict[str, float]] = None,
+        online_only: bool = False,
+        emails: Optional[List[str]] = None,
     ):
+        """
+        Fetch rider locations from the riders table.
+
+        Args:
+            conditions: Equality filters, each a dict with 'column' and 'value' keys.
+            fields: Columns to select, defaults to all columns.
+            bounding_box: Optional dict with 'min_lat', 'max_lat', 'min_long' and
+                'max_long' keys. Only riders inside the box are returned, so the
+                radius filtering happens on the server instead of after download.
+            online_only: Only return riders flagged as online.
+            emails: Only return these riders, fetched with a single query.
+
+        Returns:
+            List of dicts with 'email' and 'location' ('longitude,latitude') keys.
+            Identical concurrent queries share one request and its result.
+        """
+        key = (
+            "get_supabase_riders",
+            tuple((condition["column"], condition["value"]) for condition in conditions or ()),
+            tuple(fields or ()),
+            tuple(sorted((bounding_box or {}).items())),
+            online_only,
+            tuple(emails or ()),
+        )
+        return single_flight.do(
+            key, self._get_supabase_riders, conditions, fields, bounding_box, online_only, emails
+        )
+
+    def _get_supabase_riders(self, conditions, fields, bounding_box, online_only, emails=None):
         try:
             query = self.supabase.table(self.riders_table)
             if fields is None:
@@ -32,6 +80,17 @@ class SupabaseTransactions:
             if conditions:
                 for condition in conditions:
                     query = query.eq(condition["column"], condition["value"])
+            if emails:
+                query = query.in_("rider_email", list(emails))
+            if bounding_box:
+                query = (
+                    query.gte("current_lat", bounding_box["min_lat"])
+                    .lte("current_lat", bounding_box["max_lat"])
+                    .gte("current_long", bounding_box["min_long"])
+                    .lte("current_long", bounding_box["max_long"])
+                )
+            if online_only:
+                query = query.eq(self.rider_online_column, True)
 
             response = query.execute()
 
@@ -47,6 +106,61 @@ class SupabaseTransactions:
         except Exception as e:
             self.handle_error(e)
 
+    def get_rider_updates(self, since: Optional[str] = None, online_only: bool = False):
+        """
+        Fetch the raw location rows of riders changed after ``since``.
+
+        ``update_time`` is text in UPDATE_TIME_FORMAT, which only sorts
+        correctly within a single day, so a plain ``gt`` would miss or repeat
+        rows across days, months and years. Changes are fetched one day at a
+        time instead: the later seconds of the watermark's day, then every
+        whole day after it up to tomorrow (covering writers ahead of this
+        server's timezone). The rows are then compared as parsed timestamps.
+
+        Args:
+            since: An update_time value in UPDATE_TIME_FORMAT. When omitted,
+                or older than ``update_sync_max_days``, every rider is fetched.
+            online_only: Also select the online flag, so callers can drop
+                riders that went offline.
+
+        Returns:
+            List of dicts with 'rider_email', 'current_lat', 'current_long' and
+            'update_time' keys, plus 'is_online' with ``online_only``.
+        """
+        fields = ["rider_email", "current_lat", "current_long", "update_time"]
+        if online_only:
+            fields.append(self.rider_online_column)
+        try:
+            if not since:
+                return self.supabase.table(self.riders_table).select(*fields).execute().data
+
+            since_time = datetime.strptime(since, UPDATE_TIME_FORMAT)
+            last_day = datetime.now().date() + timedelta(days=1)
+            if (last_day - since_time.date()).days > self.update_sync_max_days:
+                rows = self.supabase.table(self.riders_table).select(*fields).execute().data
+            else:
+                rows = []
+                day = since_time.date()
+                while day <= last_day:
+                    query = self.supabase.table(self.riders_table).select(*fields).like(
+                        "update_time", f"{day.strftime('%m/%d/%Y')},%"
+                    )
+                    if day == since_time.date():
+                        # Zero-padded times of the same day do sort as text
+                        query = query.gt("update_time", since)
+                    rows.extend(query.execute().data)
+                    day += timedelta(days=1)
+            return [row for row in rows if self._updated_after(row, since_time)]
+        except Exception as e:
+            self.handle_error(e)
+
+    @staticmethod
+    def _updated_after(row, since_time):
+        try:
+            return datetime.strptime(row.get("update_time"), UPDATE_TIME_FORMAT) > since_time
+        except (TypeError, ValueError):
+            return False
+
     def send_riders_notification(
         self,
         riders,
@@ -70,7 +184,7 @@ class SupabaseTransactions:
                             "broadcast_message": (
                                 broadcast_message if message is None else message
                             ),
-                            "update_time": datetime.now().strftime("%m/%d/%Y,%H:%M:%S"),
+                            "update_time": datetime.now().strftime(UPDATE_TIME_FORMAT),
                             "order_id": order_id,
                             "price": price,
                             "request_coordinates": request_coordinates,
@@ -0,0 +1,93 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from map_clients.quota import quota_meter
+from map_clients.rider_snapshot import rider_snapshot, shared_registry
+from map_clients.route_store import route_store
+from orders.models import Order
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def sync_rider_registry(full=False):
+    """Pull rider position changes into the shared rider registry."""
+    if not shared_registry:
+        return
+    rider_snapshot.refresh(full=full)
+    logger.info(f"Rider registry synced, {len(rider_snapshot.index)} riders")
+
+
+@shared_task
+def record_route_pairs(rows, measured_at=None):
+    """Average provider legs, as built by RouteStore.rows, into the route store."""
+    when = datetime.fromisoformat(measured_at) if measured_at else None
+    route_store.record_many(rows, when=when)
+
+
+@shared_task
+def prune_route_store():
+    """Delete route store rows older than ROUTE_STORE_MAX_AGE_DAYS."""
+    deleted = route_store.prune()
+    logger.info(f"Route store pruned, {deleted} stale routes deleted")
+
+
+@shared_task
+def warm_route_store(days=None, max_pairs=None):
+    """
+    Fetch the pickup-to-recipient routes of recently delivered orders that the
+    route store does not have yet, one matrix request per pickup.
+
+    Runs once per time-of-week bucket and only warms orders delivered in the
+    current bucket, so each fetched duration is recorded under the bucket
+    its trip belongs to. Fetches are non-critical, so the run stops once no
+    provider has quota left for them, and at most ``max_pairs`` pairs are
+    fetched per run. Only provider legs count towards it, not estimates.
+    """
+    from map_clients.map_clients import map_clients_manager
+
+    max_pairs = max_pairs or settings.ROUTE_STORE_WARM_MAX_PAIRS
+    bucket = route_store.bucket()
+    since = timezone.now() - timedelta(days=days or settings.ROUTE_STORE_WARM_DAYS)
+    orders = Order.objects.filter(status="Delivered", updated_at__gte=since).only(
+        "pickup_lat", "pickup_long", "recipient_lat", "recipient_long", "is_bulk", "destinations", "updated_at"
+    )
+
+    trips = defaultdict(set)
+    for order in orders.iterator():
+        if route_store.bucket(order.updated_at) != bucket:
+            continue
+        pickup = f"{order.pickup_long},{order.pickup_lat}"
+        if order.is_bulk:
+            trips[pickup].update(f"{dest['long']},{dest['lat']}" for dest in order.destinations or [])
+        elif order.recipient_lat is not None and order.recipient_long is not None:
+            trips[pickup].add(f"{order.recipient_long},{order.recipient_lat}")
+
+    warmed = 0
+    for pickup, recipients in trips.items():
+        if warmed >= max_pairs:
+            break
+        if not any(quota_meter.allows(name, critical=False) for name in map_clients_manager.map_client_names):
+            # Past here get_matrix would only return offline estimates
+            logger.info("Map quota low, stopping the route store warm-up")
+            break
+        recipients = sorted(recipients)
+        stored = route_store.get_many([(pickup, recipient) for recipient in recipients])
+        missing = [recipient for recipient in recipients if (pickup, recipient) not in stored]
+        missing = missing[:max_pairs - warmed]
+        if not missing:
+            continue
+        try:
+            # Fetched legs are recorded in the route store, under the current
+            # bucket, by get_matrix itself
+            row = map_clients_manager.get_matrix([pickup], missing, critical=False)[0]
+        except Exception as e:
+            logger.error(f"Could not warm routes from {pickup}: {str(e)}")
+            continue
+        warmed += sum(1 for leg in row if leg is not None and not leg.approximate)
+    logger.info(f"Route store warmed with {warmed} routes from {len(trips)} pickups")
@@ -0,0 +1,322 @@
+import time
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from accounts.utils import DistanceCalculator
+from map_clients.estimator import TravelEstimator
+from map_clients.hedging import HedgeBudget
+from map_clients.map_clients import MapClientsManager, batch_distance_errors
+from map_clients.quota import QuotaMeter
+from map_clients.rate_limit import LocalBucketBackend, RateLimitExceeded, TokenBucket
+from map_clients.rider_registry import LocalShardBackend, RiderRegistry
+from map_clients.rider_set import RiderSet
+from map_clients.routes import RouteLeg
+
+
+@override_settings(
+    MAP_HEDGING_ENABLED=True,
+    MAP_HEDGE_DEFAULT_DELAY_SECONDS=0.01,
+    MAP_OFFLINE_FALLBACK_ENABLED=False,
+)
+class HedgedRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.manager = MapClientsManager()
+        self.calls = []
+
+    def route(self, call):
+        with mock.patch.object(self.manager, "ranked_clients", return_value=["tomtom", "mapbox"]), \
+                mock.patch.object(self.manager, "_call", side_effect=call), \
+                mock.patch("map_clients.map_clients.quota_meter.allows", return_value=True):
+            return self.manager._route("fetch_matrix", ([], []), hedge_endpoint="assign_order")
+
+    def test_slow_primary_fails_with_empty_hedge_budget_fails_over(self):
+        self.manager.hedge_budgets["assign_order"] = HedgeBudget(ratio=0)
+
+        def call(name, method, *args):
+            self.calls.append(name)
+            if name == "tomtom":
+                time.sleep(0.05)
+                return None
+            return [["mapbox"]]
+
+        self.assertEqual(self.route(call), [["mapbox"]])
+        self.assertEqual(self.calls, ["tomtom", "mapbox"])
+
+    def test_hedged_secondary_is_not_called_again(self):
+        self.manager.hedge_budgets["assign_order"] = HedgeBudget(ratio=1, burst=1)
+
+        def call(name, method, *args):
+            self.calls.append(name)
+            time.sleep(0.05)
+            return None
+
+        with self.assertRaises(Exception):
+            self.route(call)
+        self.assertCountEqual(self.calls, ["tomtom", "mapbox"])
+
+
+@override_settings(MAP_HEDGING_ENABLED=False, MAP_OFFLINE_FALLBACK_ENABLED=False)
+class CachedRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.manager = MapClientsManager()
+
+    def test_cache_hits_are_not_provider_calls(self):
+        leg = RouteLeg(1000, 120)
+        with mock.patch("map_clients.map_clients.matrix_cache.get_many", side_effect=lambda keys: {k: leg for k in keys}), \
+                mock.patch.object(self.manager, "_call") as call:
+            matrix = self.manager.get_matrix(["3.3,6.5"], ["3.4,6.6"])
+
+        self.assertEqual(matrix, [[leg]])
+        call.assert_not_called()
+
+    def test_hedge_delay_ignores_cache_hits(self):
+        leg = RouteLeg(1000, 120)
+        tracker = self.manager.latencies["tomtom"]
+        for _ in range(20):
+            tracker.record(2.0)
+        with mock.patch("map_clients.map_clients.matrix_cache.get_many", side_effect=lambda keys: {k: leg for k in keys}):
+            for _ in range(50):
+                self.manager.get_matrix(["3.3,6.5"], ["3.4,6.6"])
+
+        self.assertEqual(tracker.percentile(95, default=0), 2.0)
+
+    def test_provider_failures_are_recorded_on_the_breaker(self):
+        breaker = self.manager.breakers["tomtom"]
+        with mock.patch("map_clients.map_clients.matrix_cache.get_many", return_value={}), \
+                mock.patch("map_clients.map_clients.route_store.get_many", return_value={}), \
+                mock.patch.object(self.manager, "ranked_clients", return_value=["tomtom"]), \
+                mock.patch("map_clients.map_clients.quota_meter.allows", return_value=True), \
+                mock.patch("map_clients.map_clients.TomTom.fetch_matrix", return_value=None), \
+                mock.patch.object(breaker, "allow_request", return_value=True), \
+                mock.patch.object(breaker, "record_failure") as record_failure, \
+                mock.patch.object(breaker, "record_success") as record_success:
+            with self.assertRaises(Exception):
+                self.manager.get_matrix(["3.3,6.5"], ["3.4,6.6"])
+
+        record_failure.assert_called_once_with()
+        record_success.assert_not_called()
+
+
+    def test_half_open_probe_is_kept_for_failover(self):
+        mapbox = self.manager.breakers["mapbox"]
+        mapbox.cache.set(mapbox._key("open_until"), time.time() - 1, timeout=None)
+        self.addCleanup(mapbox._close)
+        tomtom, fallback = mock.Mock(), mock.Mock()
+        tomtom.fetch_matrix.side_effect = [[["tomtom"]], None]
+        fallback.fetch_matrix.return_value = [["mapbox"]]
+        clients = {"tomtom": tomtom, "mapbox": fallback}
+
+        with mock.patch.object(self.manager, "ranked_clients", return_value=["tomtom", "mapbox"]), \
+                mock.patch.object(self.manager, "get_client", side_effect=clients.get), \
+                mock.patch("map_clients.map_clients.quota_meter.allows", return_value=True):
+            self.assertEqual(self.manager._route("fetch_matrix", ([], [])), [["tomtom"]])
+            self.assertEqual(self.manager._route("fetch_matrix", ([], [])), [["mapbox"]])
+
+        self.assertEqual(mapbox.state, "closed")
+
+
+@override_settings(RIDER_ONLINE_FILTER=True)
+class RiderLocationLookupTests(SimpleTestCase):
+    def test_missing_riders_are_fetched_in_one_online_query(self):
+        from map_clients import rider_snapshot
+
+        snapshot = mock.Mock(offline=frozenset({"off@example.com"}))
+        snapshot.get_riders.return_value = RiderSet(["known@example.com"], [6.5], [3.3])
+        found = [{"email": "new@example.com", "location": "3.4,6.6"}]
+        with mock.patch.object(rider_snapshot, "rider_snapshot", snapshot), \
+                mock.patch.object(rider_snapshot, "get_dispatch_index", return_value=snapshot), \
+                mock.patch.object(rider_snapshot.supabase, "get_supabase_riders", return_value=found) as query:
+            riders = rider_snapshot.get_rider_locations(
+                ["known@example.com", "off@example.com", "new@example.com", "gone@example.com"]
+            )
+
+        query.assert_called_once_with(
+            fields=["rider_email", "current_lat", "current_long"],
+            online_only=True,
+            emails=["new@example.com", "gone@example.com"],
+        )
+        self.assertEqual(list(riders.emails), ["known@example.com", "new@example.com"])
+
+
+class RiderSnapshotRefreshTests(SimpleTestCase):
+    def test_failed_full_resync_keeps_the_current_riders(self):
+        from map_clients.rider_snapshot import RiderLocationSnapshot
+
+        source = mock.Mock()
+        source.get_rider_updates.return_value = [
+            {"rider_email": "a@example.com", "current_lat": 6.5, "current_long": 3.3,
+             "update_time": "10/16/2026,09:00:00"},
+        ]
+        snapshot = RiderLocationSnapshot(source, full_sync_interval=0)
+        snapshot.refresh(full=True)
+        last_sync, watermark = snapshot.last_sync, snapshot.watermark
+
+        source.get_rider_updates.return_value = None
+        snapshot.refresh(full=True)
+
+        self.assertIn("a@example.com", snapshot.index)
+        self.assertEqual(snapshot.watermark, watermark)
+        self.assertEqual(snapshot.last_sync, last_sync)
+
+
+class RiderRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = RiderRegistry(LocalShardBackend(), shard_degrees=0.5)
+
+    def test_within_radius_spans_shards_closest_first(self):
+        self.registry.bulk_load(RiderSet(["far", "near", "out"], [6.52, 6.49, 7.5], [3.3, 3.3, 3.3]))
+
+        self.assertNotEqual(self.registry.shard_for(6.52, 3.3), self.registry.shard_for(6.49, 3.3))
+        self.assertEqual(list(self.registry.within_radius("3.3,6.5", 5).emails), ["near", "far"])
+
+    def test_bulk_upsert_moves_riders_between_shards(self):
+        self.registry.bulk_load(RiderSet(["a", "b"], [6.5, 6.6], [3.3, 3.3]))
+        self.registry.bulk_load(RiderSet(["a"], [7.1], [3.3]))
+
+        backend = self.registry.backend
+        self.assertEqual(len(self.registry), 2)
+        self.assertEqual(backend.shard_of("a"), self.registry.shard_for(7.1, 3.3))
+        self.assertNotIn("a", backend.shards[self.registry.shard_for(6.5, 3.3)])
+        self.assertEqual(list(self.registry.within_radius("3.3,6.5", 15).emails), ["b"])
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = 100.0
+        patcher = mock.patch("map_clients.rate_limit.time.monotonic", side_effect=lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_empty_bucket_denies_until_refilled(self):
+        backend = LocalBucketBackend()
+        self.assertEqual(backend.take("test", 1.0, 2, 1), 0)
+        self.assertEqual(backend.take("test", 1.0, 2, 1), 0)
+        self.assertEqual(backend.take("test", 1.0, 2, 1), 1.0)
+
+        self.clock += 0.5
+        self.assertEqual(backend.take("test", 1.0, 2, 1), 0.5)
+        self.clock += 0.5
+        self.assertEqual(backend.take("test", 1.0, 2, 1), 0)
+
+    def test_acquire_sleeps_only_as_long_as_the_refill(self):
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            self.clock += seconds
+
+        bucket = TokenBucket("test", rate=2.0, capacity=1, backend=LocalBucketBackend())
+        with mock.patch("map_clients.rate_limit.time.sleep", side_effect=sleep):
+            bucket.acquire()
+            bucket.acquire()
+
+        self.assertEqual(sleeps, [0.5])
+
+    def test_acquire_gives_up_when_the_wait_exceeds_the_timeout(self):
+        bucket = TokenBucket("test", rate=0.1, capacity=1, backend=LocalBucketBackend())
+        bucket.acquire(timeout=0)
+
+        with self.assertRaises(RateLimitExceeded):
+            bucket.acquire(timeout=1)
+
+
+@override_settings(ROUTE_DETOUR_UPPER_BOUND=2.0)
+class BatchDistanceValidationTests(SimpleTestCase):
+    @staticmethod
+    def destination(name, lat):
+        return {"recipient_name": name, "recipient_address": name, "long": 3.3, "lat": lat}
+
+    def test_only_uncertain_destinations_go_to_one_matrix_request(self):
+        destinations = [
+            self.destination("far", 6.56),  # ~6.7 km in a straight line
+            self.destination("near", 6.51),  # ~1.1 km, within the limit even doubled
+            self.destination("uncertain", 6.53),  # ~3.3 km, over the limit doubled
+        ]
+        with mock.patch(
+            "map_clients.map_clients.map_clients_manager.get_matrix", return_value=[[RouteLeg(6000, 600)]]
+        ) as get_matrix:
+            errors, warnings = batch_distance_errors("3.3,6.5", destinations)
+
+        get_matrix.assert_called_once_with(["3.3,6.5"], ["3.3,6.53"])
+        self.assertEqual([error["recipient_name"] for error in errors], ["far", "uncertain"])
+        self.assertEqual(errors[1]["distance_km"], 6.0)
+        self.assertEqual(warnings, [])
+
+    def test_approximate_leg_over_the_limit_only_warns(self):
+        with mock.patch(
+            "map_clients.map_clients.map_clients_manager.get_matrix",
+            return_value=[[RouteLeg(6000, 600, approximate=True)]],
+        ):
+            errors, warnings = batch_distance_errors("3.3,6.5", [self.destination("uncertain", 6.53)])
+
+        self.assertEqual(errors, [])
+        self.assertEqual([warning["recipient_name"] for warning in warnings], ["uncertain"])
+
+
+class QuotaMeterTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.meter = QuotaMeter(
+            prices={"mapbox": 2.0},
+            daily_budgets={"mapbox": 100},
+            monthly_budgets={"mapbox": 0},
+            degrade_at=0.8,
+            cache_alias="default",
+        )
+
+    def test_non_critical_callers_are_held_back_from_the_threshold(self):
+        self.meter.record("mapbox", 79)
+        self.assertTrue(self.meter.allows("mapbox", critical=False))
+
+        self.meter.record("mapbox", 1)
+        self.assertFalse(self.meter.allows("mapbox", critical=False))
+        self.assertTrue(self.meter.allows("mapbox", critical=True))
+
+        self.meter.record("mapbox", 20)
+        self.assertFalse(self.meter.allows("mapbox", critical=True))
+        self.assertEqual(self.meter.usage("mapbox", "day")["cost"], 0.2)
+
+    def test_budgets_are_not_enforced_without_a_shared_cache(self):
+        meter = QuotaMeter(prices={}, daily_budgets={"mapbox": 1}, monthly_budgets={}, cache_alias=None)
+        meter.record("mapbox", 10)
+
+        self.assertTrue(meter.allows("mapbox", critical=False))
+
+
+class TravelEstimatorTests(SimpleTestCase):
+    def setUp(self):
+        zone = {
+            "min_lat": 6.4, "max_lat": 6.7, "min_long": 3.2, "max_long": 3.5,
+            "detour_factor": 1.5, "peak_speed_kmh": 10, "off_peak_speed_kmh": 30,
+        }
+        self.estimator = TravelEstimator(
+            zones=[zone], detour_factor=1.4, peak_speed_kmh=15, off_peak_speed_kmh=25, peak_hours=[8]
+        )
+
+    def estimate(self, origin, lat, long, hour):
+        riders = RiderSet(["rider"], [lat], [long])
+        straight_line = DistanceCalculator(origin).distances_to(riders)[0]
+        distances, durations = self.estimator.estimate(
+            origin, riders, when=datetime(2026, 10, 16, hour, tzinfo=timezone.utc)
+        )
+        return straight_line, distances[0], durations[0]
+
+    def test_zone_detour_and_peak_speed(self):
+        straight_line, distance, duration = self.estimate("3.3,6.5", 6.6, 3.3, hour=8)
+
+        self.assertAlmostEqual(distance, straight_line * 1.5)
+        self.assertAlmostEqual(duration, distance / 10 * 3600)
+
+    def test_zone_off_peak_speed(self):
+        _, distance, duration = self.estimate("3.3,6.5", 6.6, 3.3, hour=12)
+
+        self.assertAlmostEqual(duration, distance / 30 * 3600)
+
+    def test_origin_outside_every_zone_uses_the_defaults(self):
+        straight_line, distance, duration = self.estimate("7.5,9.0", 9.1, 7.5, hour=8)
+
+        self.assertAlmostEqual(distance, straight_line * 1.4)
+        self.assertAlmostEqual(duration, distance / 15 * 3600)
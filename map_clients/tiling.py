@@ -0,0 +1,44 @@
+def _chunks(total, size):
+    return [slice(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def coordinate_tiles(n_sources, n_destinations, max_coordinates):
+    """
+    Split an N×M matrix into tiles whose sources plus destinations fit in
+    ``max_coordinates`` (the Mapbox limit).
+
+    The shorter side gets at most half of the coordinates and the longer side
+    the rest, so a 1×20 matrix takes three 1×9 tiles rather than twenty.
+
+    Returns:
+        list: (source slice, destination slice) tuples.
+    """
+    if n_sources + n_destinations <= max_coordinates:
+        return [(slice(0, n_sources), slice(0, n_destinations))]
+    if n_sources <= n_destinations:
+        sources = min(n_sources, max_coordinates // 2)
+        destinations = max_coordinates - sources
+    else:
+        destinations = min(n_destinations, max_coordinates // 2)
+        sources = max_coordinates - destinations
+    return [
+        (source_slice, destination_slice)
+        for source_slice in _chunks(n_sources, sources)
+        for destination_slice in _chunks(n_destinations, destinations)
+    ]
+
+
+def cell_tiles(n_sources, n_destinations, max_cells):
+    """
+    Split an N×M matrix into tiles of at most ``max_cells`` cells (the TomTom limit).
+
+    Returns:
+        list: (source slice, destination slice) tuples.
+    """
+    destinations = min(n_destinations, max_cells)
+    sources = max(1, max_cells // destinations)
+    return [
+        (source_slice, destination_slice)
+        for source_slice in _chunks(n_sources, sources)
+        for destination_slice in _chunks(n_destinations, destinations)
+    ]
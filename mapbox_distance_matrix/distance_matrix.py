@@ -1,124 +1,164 @@
-import requests
-import time
+import asyncio
+import atexit
+import os
+import threading
+
+import httpx
+from django.conf import settings
+
+from map_clients.quota import quota_meter
+from map_clients.rate_limit import get_rate_limiter
+from map_clients.replay import async_transport
+from map_clients.routes import RouteLeg
+from map_clients.tiling import coordinate_tiles
+
+
+class MatrixLoop:
+    """
+    A process-wide event loop, run in a daemon thread, owning the one
+    AsyncClient every Mapbox matrix request goes through.
+
+    httpx clients are bound to the loop they connect on, so instead of a
+    client per caller loop (async_to_sync outside an ASGI server starts a new
+    loop per call) every request is run here, reusing the pool's warm TLS
+    connections. The client is closed when the process exits; a forked child
+    starts its own loop and client.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._client = None
+
+    def _running_loop(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="mapbox-matrix", daemon=True).start()
+                self._pid, self._loop, self._client = os.getpid(), loop, None
+            return self._loop
+
+    def client(self):
+        """The shared AsyncClient; only to be used on this loop."""
+        if self._client is None:
+            limits = httpx.Limits(max_connections=settings.MAPBOX_MATRIX_CONCURRENCY)
+            timeout = httpx.Timeout(
+                settings.MAP_HTTP_READ_TIMEOUT_SECONDS, connect=settings.MAP_HTTP_CONNECT_TIMEOUT_SECONDS
+            )
+            self._client = httpx.AsyncClient(limits=limits, timeout=timeout, transport=async_transport())
+        return self._client
+
+    def run(self, coroutine):
+        """Run ``coroutine`` on the loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._running_loop()).result()
+
+    async def arun(self, coroutine):
+        """Run ``coroutine`` on the loop, awaiting it from another loop."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self._running_loop()))
+
+    def close(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            loop, client = self._loop, self._client
+            self._pid = self._loop = self._client = None
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(
+                timeout=settings.MAP_HTTP_CONNECT_TIMEOUT_SECONDS
+            )
+        loop.call_soon_threadsafe(loop.stop)
+
+
+matrix_loop = MatrixLoop()
+atexit.register(matrix_loop.close)
 
 
 class MapboxDistanceDuration:
-    def __init__(self, api_key):
-        self.api_key = api_key
+    base_url = "https://api.mapbox.com/directions-matrix/v1/mapbox/driving-traffic"
 
-    def get_distance_duration(self, origin, riders_locations):
+    def __init__(self, api_key, concurrency=None, max_coordinates=None):
+        self.api_key = api_key
+        if concurrency is None:
+            concurrency = settings.MAPBOX_MATRIX_CONCURRENCY
+        if max_coordinates is None:
+            max_coordinates = settings.MAPBOX_MATRIX_MAX_COORDINATES
+        self.concurrency = concurrency
+        self.max_coordinates = max_coordinates
+
+    def get_matrix(self, sources, destinations):
         """
-        Get distance and duration between origin and multiple riders_locations using Mapbox Matrix API.
+        Get distances and durations from every source to every destination.
 
         Args:
-        - origin (str): Origin coordinates in the format 'longitude,latitude'.
-        - riders_locations (list of dict): List of dictionaries, each containing 'email' and 'location' keys.
-                                    'location' is a string in the format 'longitude,latitude'.
+        - sources (list of str): Coordinates in the format 'longitude,latitude'.
+        - destinations (list of str): Coordinates in the format 'longitude,latitude'.
 
         Returns:
-        - List of dictionaries: List of dictionaries, each containing 'email', 'distance' (in meters), and
-                                'duration' (in minutes) for each location.
-        """
-        if len(riders_locations) == 0:
-            return []
-
-        # Maximum 10 riders_locations per request
-        batch_size = 9
-        num_batches = (len(riders_locations) + batch_size - 1) // batch_size
-
-        results = []
-
-        # Define the Mapbox Matrix API endpoint URL
-        url_base = f"https://api.mapbox.com/directions-matrix/v1/mapbox/driving-traffic/{origin};"
-
-        if num_batches == 1 and len(riders_locations) == 1:
-            # Directly make a request without batching
-            rider_location = riders_locations[0]
-            destinations_str = rider_location["location"]
-            url = f"{url_base}{destinations_str}?access_token={self.api_key}"
-            response = requests.get(url)
-
-            if response.status_code == 200:
-                data = response.json()
-                distance = data["destinations"][1]["distance"]
-                duration = data["durations"][1][0]
-                formatted_duration = self.format_duration(duration)
-                distance = round(distance / 1000, 2)
-                results.append(
-                    {
-                        "email": rider_location["email"],
-                        "distance": distance,
-                        "duration": formatted_duration,
-                    }
-                )
-            else:
-                raise Exception(
-                    f"Failed to get response. Status code: {response.status_code}. Error: {response.text}"
-                )
-        else:
-            for i in range(num_batches):
-                start_idx = i * batch_size
-                end_idx = min((i + 1) * batch_size, len(riders_locations))
-                batch_destinations = riders_locations[start_idx:end_idx]
-
-                # Convert riders_locations list to a semicolon-separated string
-                destinations_str = ";".join(
-                    [
-                        rider_location["location"]
-                        for rider_location in batch_destinations
-                    ]
-                )
-
-                # Make a GET request to the API
-                url = f"{url_base}{destinations_str}?access_token={self.api_key}"
-                response = requests.get(url)
-
-                # Check if the request was successful (status code 200)
-                if response.status_code == 200:
-                    data = response.json()
-
-                    # Extract distances and durations from the response
-                    for j, destination in enumerate(data["destinations"][1:], start=1):
-                        distance = destination["distance"]
-                        duration = data["durations"][j][0]
-                        formatted_duration = self.format_duration(duration)
-                        distance = round(distance / 1000, 2)
-
-                        results.append(
-                            {
-                                "email": batch_destinations[j - 1]["email"],
-                                "distance": distance,
-                                "duration": formatted_duration,
-                            }
-                        )
-
-                else:
-                    raise Exception(
-                        f"Failed to get response. Status code: {response.status_code}. Error: {response.text}"
-                    )
-
-                # Wait for a short interval to avoid hitting rate limits
-                if i < num_batches - 1:
-                    time.sleep(6)
-
-        return results
-
-    @staticmethod
-    def format_duration(duration: int) -> str:
+        - List of rows, one per source, each with one cell per destination: a RouteLeg in meters
+          and seconds, or None when Mapbox found no route.
         """
-        Format a duration in seconds into a human-readable format.
+        return matrix_loop.run(self._matrix(sources, destinations))
 
-        Parameters:
-        - duration (int): The duration in seconds.
+    async def aget_matrix(self, sources, destinations):
+        """
+        Async version of get_matrix.
 
-        Returns:
-        - str: The formatted duration string.
+        The matrix is split into tiles of at most ``max_coordinates`` sources plus
+        destinations and the tiles are sent concurrently, at most ``concurrency``
+        at a time, over the process's shared connection pool (see MatrixLoop).
         """
-        duration_minutes, duration_seconds = divmod(duration, 60)
-
-        if duration <= 60:
-            return f"{duration} secs"
-        elif duration_seconds == 0:
-            return f"{duration_minutes} minutes"
-        else:
-            return f"{duration_minutes} mins {duration_seconds} secs"
+        return await matrix_loop.arun(self._matrix(sources, destinations))
+
+    async def _matrix(self, sources, destinations):
+        matrix = [[None] * len(destinations) for _ in sources]
+        if not sources or not destinations:
+            return matrix
+
+        tiles = coordinate_tiles(len(sources), len(destinations), self.max_coordinates)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        client = matrix_loop.client()
+        tile_results = await asyncio.gather(
+            *[
+                self._fetch_tile(client, semaphore, sources[source_slice], destinations[destination_slice])
+                for source_slice, destination_slice in tiles
+            ]
+        )
+
+        for (source_slice, destination_slice), rows in zip(tiles, tile_results):
+            for i, row in enumerate(rows, start=source_slice.start):
+                matrix[i][destination_slice] = row
+        return matrix
+
+    async def _fetch_tile(self, client, semaphore, sources, destinations):
+        coordinates = ";".join(list(sources) + list(destinations))
+        params = {
+            "access_token": self.api_key,
+            "sources": ";".join(str(i) for i in range(len(sources))),
+            "destinations": ";".join(str(i) for i in range(len(sources), len(sources) + len(destinations))),
+            "annotations": "distance,duration",
+        }
+
+        async with semaphore:
+            await get_rate_limiter("mapbox_matrix").aacquire(timeout=settings.RATE_LIMIT_TIMEOUT_SECONDS)
+            response = await client.get(f"{self.base_url}/{coordinates}", params=params)
+
+        if response.status_code != 200:
+            raise Exception(
+                f"Failed to get response. Status code: {response.status_code}. Error: {response.text}"
+            )
+        await quota_meter.arecord("mapbox", len(sources) * len(destinations))
+
+        data = response.json()
+        rows = []
+        for distances, durations in zip(data["distances"], data["durations"]):
+            rows.append(
+                [
+                    None
+                    if distance is None or duration is None
+                    else RouteLeg(distance, duration)
+                    for distance, duration in zip(distances, durations)
+                ]
+            )
+        return rows
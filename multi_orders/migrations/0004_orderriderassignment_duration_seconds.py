@@ -0,0 +1,18 @@
+# Generated by Django 4.1.6 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multi_orders', '0003_remove_orderriderassignment_assigned_weight_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderriderassignment',
+            name='duration_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -28,6 +28,7 @@ class OrderRiderAssignment(models.Model):
     pickup_lat = models.FloatField(default=0)  # Pickup latitude
     pickup_long = models.FloatField(default=0)  # Pickup longitude
 
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True)  # Rider's ETA to pickup when accepted
     assigned_at = models.DateTimeField(auto_now_add=True)
     sequence = models.PositiveIntegerField()  # Delivery sequence
     completed = models.BooleanField(default=False)
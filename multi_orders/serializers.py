@@ -1,8 +1,16 @@
 from rest_framework import serializers
+from map_clients.routes import format_duration
 from .models import OrderRiderAssignment
 
 
 class RiderAssignmentSerializer(serializers.ModelSerializer):
+    duration = serializers.SerializerMethodField()
+
     class Meta:
         model = OrderRiderAssignment
-        fields = ['order', 'rider', 'assigned_at', 'status']
+        fields = ['order', 'rider', 'assigned_at', 'status', 'duration_seconds', 'duration']
+
+    def get_duration(self, assignment):
+        if assignment.duration_seconds is not None:
+            return format_duration(assignment.duration_seconds)
+        return None
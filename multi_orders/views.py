@@ -24,7 +24,9 @@ from accounts.utils import (
     str_to_bool,
 )
 from orders.serializers import OrderDetailSerializer
-from map_clients.map_clients import MapClientsManager, get_distance
+from map_clients.map_clients import MapClientsManager, get_route_leg
+from map_clients.rider_snapshot import get_rider_locations
+from map_clients.serializers import RiderRouteSerializer
 from map_clients.supabase_query import SupabaseTransactions
 import logging
 
@@ -112,30 +114,24 @@ class AcceptOrDeclineOrderAssignmentView(APIView, MultiRiderOrderErrorHandlingMi
             order_location = f"{pickup_long},{pickup_lat}"
             recipient_location = f"{recipient_long},{recipient_lat}"
 
-            # Fetch rider data from Supabase
-            conditions = [{"column": "rider_email", "value": rider.user.email}]
-            fields = ["rider_email", "current_lat", "current_long"]
-            rider_data = supabase.get_supabase_riders(conditions=conditions, fields=fields)
+            # Fetch the rider's current location
+            rider_data = get_rider_locations([rider.user.email])
 
             # Calculate distance and duration
-            try:
-                result = self.get_matrix_results(order_location, rider_data)
-            except Exception as e:
-                logger.error(f"Error processing API request: {str(e)}")
-                map_clients_manager.switch_client()
-                result = self.get_matrix_results(order_location, rider_data)
+            result = self.get_matrix_results(order_location, rider_data)
 
-            distance = result[0]["distance"]
-            duration = result[0]["duration"]
+            route = RiderRouteSerializer(result[0]).data
+            distance = route["distance"]
+            duration = route["duration"]
 
             # Calculate trip distance and cost
-            trip_distance = get_distance(order_location, recipient_location)
-            cost_of_ride = round(float(rider.charge_per_km) * trip_distance, 2)
+            trip_leg = get_route_leg(order_location, recipient_location)
+            cost_of_ride = round(float(rider.charge_per_km) * trip_leg.distance_km, 2)
 
             # Update the order assignment and parent order
             order_assignment.status = "Accepted"
             order_assignment.distance = distance
-            order_assignment.duration = duration
+            order_assignment.duration_seconds = round(result[0].leg.duration_s)
             order_assignment.assigned_weight = order.total_weight  # Example: Can be adjusted based on bulk logic
             order_assignment.save()
 
@@ -154,9 +150,10 @@ class AcceptOrDeclineOrderAssignmentView(APIView, MultiRiderOrderErrorHandlingMi
                 "vehicle_number": rider.vehicle_registration_number,
                 "rating": rider.ratings if rider.ratings is not None else 0,
                 "distance": f"{distance:.2f} km",
-                "duration": f"{duration} minutes",
+                "duration": duration,
                 "order_completed": rider.completed_orders,
                 "price": f"{cost_of_ride:.2f}",
+                "price_approximate": trip_leg.approximate,
             }
             send_customer_notification.delay(
                 customer=order.customer.user.email,
@@ -190,7 +187,7 @@ class AcceptOrDeclineOrderAssignmentView(APIView, MultiRiderOrderErrorHandlingMi
 
             # Update rider statistics
             rider.declined_requests += 1
-            rider.save()
+            rider.save(update_fields=["declined_requests"])
 
             # Log declined order
             DeclinedOrder.objects.create(
@@ -235,25 +232,17 @@ class AcceptOrDeclineOrderAssignmentView(APIView, MultiRiderOrderErrorHandlingMi
                 id__in=[declined_assignment.rider.id] + list(order.riders.values_list("id", flat=True))
             )
 
-            # Fetch rider locations and prioritize by proximity
-            fields = ["rider_email", "current_lat", "current_long"]
-            riders_location_data = supabase.get_supabase_riders(fields=fields)
-            distance_calculator = DistanceCalculator(pickup_location)
-
-            nearby_suitable_riders = [
-                rider for rider in riders_location_data
-                if rider["email"] in alternative_riders.values_list("user__email", flat=True)
-            ]
-
-            nearby_suitable_riders.sort(
-                key=lambda r: distance_calculator.calculate_distance(
-                    f"{r['current_long']},{r['current_lat']}"
-                )
+            # Fetch locations of the suitable riders and prioritize by proximity
+            nearby_suitable_riders = get_rider_locations(
+                list(alternative_riders.values_list("user__email", flat=True))
+            )
+            nearby_suitable_riders = DistanceCalculator(pickup_location).nearest_destinations(
+                nearby_suitable_riders, 1
             )
 
             # Assign closest rider
             if nearby_suitable_riders:
-                closest_rider_email = nearby_suitable_riders[0]["email"]
+                closest_rider_email = nearby_suitable_riders[0].email
                 replacement_rider = Rider.objects.get(user__email=closest_rider_email)
 
                 OrderRiderAssignment.objects.create(
@@ -307,9 +296,7 @@ class AcceptOrDeclineOrderAssignmentView(APIView, MultiRiderOrderErrorHandlingMi
 
     def get_matrix_results(self, origin, destinations):
         """Get results from Matrix API."""
-        map_client = map_clients_manager.get_client()
-        results = map_client.get_distances_duration(origin, destinations)
-        return results
+        return map_clients_manager.get_matrix_results(origin, destinations)
 
 
 class BulkOrderAssignmentView(APIView):
@@ -394,29 +381,20 @@ class BulkOrderAssignmentView(APIView):
     def assign_order_to_rider(self, order, rider, successful_assignments, failed_assignments):
         try:
             order_location = f"{order.pickup_long},{order.pickup_lat}"
-            conditions = [{"column": "rider_email", "value": rider.user.email}]
-            fields = ["rider_email", "current_lat", "current_long"]
-
-            rider_data = supabase.get_supabase_riders(
-                conditions=conditions, fields=fields
-            )
+            rider_data = get_rider_locations([rider.user.email])
 
-            try:
-                result = self.get_matrix_results(order_location, rider_data)
-            except Exception as e:
-                logger.error(f"Error processing API request: {str(e)}")
-                map_clients_manager.switch_client()
-                result = self.get_matrix_results(order_location, rider_data)
+            result = self.get_matrix_results(order_location, rider_data)
 
-            distance = result[0]["distance"]
-            duration = result[0]["duration"]
+            route = RiderRouteSerializer(result[0]).data
+            distance = route["distance"]
+            duration = route["duration"]
 
             code = generate_otp(length=4)
 
             order.rider = rider
             order.status = "WaitingForPickup"
             order.distance = distance
-            order.duration = duration
+            order.duration_seconds = round(result[0].leg.duration_s)
             order.price = decimal.Decimal(order.price) * 100  # Assuming price per order
             order.order_completion_code = code
             order.save()
@@ -442,9 +420,7 @@ class BulkOrderAssignmentView(APIView):
 
     def get_matrix_results(self, origin, destinations):
         """Get results from Matrix API."""
-        map_client = map_clients_manager.get_client()
-        results = map_client.get_distances_duration(origin, destinations)
-        return results
+        return map_clients_manager.get_matrix_results(origin, destinations)
 
 
 class UpdateBulkOrderStatusView(APIView):
@@ -551,7 +527,6 @@ class UpdateBulkOrderStatusView(APIView):
 
 class RealTimeOrderTrackingView(APIView):
     permission_classes = [IsAuthenticated]
-    SEARCH_RADIUS_KM = 5
 
     def get(self, request, order_id, *args, **kwargs):
         try:
@@ -566,8 +541,9 @@ class RealTimeOrderTrackingView(APIView):
                     # Calculate distance and ETA
                     result = self.get_additional_information(order, rider)
 
-                    distance = result[0]["distance"]
-                    duration = result[0]["duration"]
+                    route = RiderRouteSerializer(result[0]).data
+                    distance = route["distance"]
+                    duration = route["duration"]
 
                     # distance_to_destination = get_distance(
                     #     f"{rider.current_long},{rider.current_lat}",
@@ -586,7 +562,7 @@ class RealTimeOrderTrackingView(APIView):
                             "long": rider.rider.current_long
                         },
                         "distance_to_destination": f"{distance} km",
-                        "eta": f"{duration} minutes",
+                        "eta": duration,
                     })
 
             # Serialize order details
@@ -600,27 +576,20 @@ class RealTimeOrderTrackingView(APIView):
 
     def get_additional_information(self, order, rider):
         order_location = f"{order.pickup_long},{order.pickup_lat}"
-        conditions = [{"column": "rider_email", "value": rider.rider.email}]
-        fields = ["rider_email", "current_lat", "current_long"]
+        rider_data = get_rider_locations([rider.rider.email])
 
-        rider_data = supabase.get_supabase_riders(
-            conditions=conditions, fields=fields
-        )
-
-        try:
-            result = self.get_matrix_results(order_location, rider_data)
-        except Exception as e:
-            logger.error(f"Error processing API request: {str(e)}")
-            map_clients_manager.switch_client()
-            result = self.get_matrix_results(order_location, rider_data)
+        result = self.get_matrix_results(order_location, rider_data)
 
         return result
 
     def get_matrix_results(self, origin, destinations):
-        """Get results from Matrix API."""
-        map_client = map_clients_manager.get_client()
-        results = map_client.get_distances_duration(origin, destinations)
-        return results
+        """
+        Get results from Matrix API, hedged as tracking is polled live, and
+        from cached or estimated routes once map quota runs low.
+        """
+        return map_clients_manager.get_matrix_results(
+            origin, destinations, hedge_endpoint="order_tracking", critical=False
+        )
 
 
 class BulkOrderSummaryView(APIView):
@@ -59,6 +59,7 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     duration = models.CharField(null=True, blank=True, max_length=30)
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True)  # Rider's ETA to pickup when assigned
     distance = models.CharField(max_length=10, blank=True, null=True)
 
     is_bulk = models.BooleanField(default=False)  # New field
@@ -1,12 +1,22 @@
 from accounts.serializers import CustomerSerializer, RiderDetailSerializer
 from rest_framework import serializers
+from map_clients.routes import format_duration
 from .models import Order
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderDurationMixin:
+    """Formats the stored ETA in seconds; orders assigned before it was stored keep their text."""
+
+    def get_duration(self, order):
+        if order.duration_seconds is not None:
+            return format_duration(order.duration_seconds)
+        return order.duration
+
+
+class OrderSerializer(OrderDurationMixin, serializers.ModelSerializer):
     cost = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     distance = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-    duration = serializers.CharField(max_length=20, read_only=True)
+    duration = serializers.SerializerMethodField()
     rider = serializers.StringRelatedField()
     customer = serializers.StringRelatedField()
 
@@ -82,8 +92,9 @@ class OrderSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class OrderDetailSerializer(serializers.ModelSerializer):
+class OrderDetailSerializer(OrderDurationMixin, serializers.ModelSerializer):
     customer = CustomerSerializer(read_only=True)
+    duration = serializers.SerializerMethodField()
     rider = RiderDetailSerializer(read_only=True)
 
     class Meta:
@@ -108,11 +119,13 @@ class OrderDetailSerializer(serializers.ModelSerializer):
             "rider",
             "distance",
             "duration",
+            "duration_seconds",
         ]
 
 
-class OrderDetailUserSerializer(serializers.ModelSerializer):
+class OrderDetailUserSerializer(OrderDurationMixin, serializers.ModelSerializer):
     cost = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    duration = serializers.SerializerMethodField()
     customer = CustomerSerializer(read_only=True)
     rider = RiderDetailSerializer(read_only=True)
 
@@ -140,5 +153,6 @@ class OrderDetailUserSerializer(serializers.ModelSerializer):
             "order_completion_code",
             "distance",
             "duration",
+            "duration_seconds",
             "is_bulk"
         ]
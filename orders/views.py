@@ -1,9 +1,11 @@
 import decimal
+from django.conf import settings
 from django.utils import timezone
 from decimal import Decimal
 from accounts.models import Rider
+from accounts.rider_profiles import rider_profiles
 from django.db import transaction
-from django.db.models import Avg, Q
+from django.db.models import Q
 
 from django.shortcuts import get_object_or_404
 from accounts.utils import (
@@ -13,8 +15,12 @@ from accounts.utils import (
     send_riders_notification,
     str_to_bool,
 )
-from map_clients.map_clients import MapClientsManager, get_distance, validate_distances, validate_single_order, \
-    validate_coordinates
+from map_clients.map_clients import MapClientsManager, get_distance, get_route_leg, validate_distances, \
+    validate_single_order, validate_coordinates
+from map_clients.rider_index import RiderGridIndex
+from map_clients.rider_set import as_rider_set
+from map_clients.rider_snapshot import get_dispatch_index, get_rider_locations
+from map_clients.serializers import RiderRouteSerializer
 from map_clients.supabase_query import SupabaseTransactions
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
@@ -40,27 +46,76 @@ supabase = SupabaseTransactions()
 logger = logging.getLogger(__name__)
 
 
-def get_rider_available(SEARCH_RADIUS_KM, order_location):
+def get_riders_near(order_location, radius):
+    """Fetch only the riders inside the bounding box of the search radius."""
     fields = ["rider_email", "current_lat", "current_long"]
-    riders_location_data = supabase.get_supabase_riders(fields=fields)
+    return supabase.get_supabase_riders(
+        fields=fields,
+        bounding_box=DistanceCalculator(order_location).bounding_box(radius),
+        online_only=settings.RIDER_ONLINE_FILTER,
+    )
+
+
+def get_rider_available(order_location, target=None, eligible=None):
+    """
+    Find riders around a pickup point with an expanding-ring search.
+
+    The radius starts at RIDER_SEARCH_START_KM and grows until ``target``
+    eligible riders are found or RIDER_SEARCH_MAX_KM is reached.
 
-    distance_calc = DistanceCalculator(order_location)
-    riders_within_radius = distance_calc.destinations_within_radius(
-        riders_location_data, SEARCH_RADIUS_KM
+    Args:
+        order_location (str): Pickup coordinates in the format 'longitude,latitude'.
+        target (int, optional): Riders needed to stop early, defaults to RIDER_SEARCH_TARGET.
+        eligible (callable, optional): Takes a list of emails and returns the eligible ones.
+
+    Returns:
+        list: Riders as dicts with 'email' and 'location' keys, closest first.
+    """
+    if target is None:
+        target = settings.RIDER_SEARCH_TARGET
+    search = dict(
+        target=target,
+        start_radius=settings.RIDER_SEARCH_START_KM,
+        max_radius=settings.RIDER_SEARCH_MAX_KM,
+        growth=settings.RIDER_SEARCH_GROWTH,
+        eligible=eligible,
     )
+
+    dispatch_index = get_dispatch_index()
+    if dispatch_index is not None:
+        riders_within_radius, _ = dispatch_index.expanding_search(order_location, **search)
+        return riders_within_radius
+
+    riders_location_data = get_riders_near(order_location, settings.RIDER_SEARCH_MAX_KM)
+    rider_index = RiderGridIndex(riders_location_data, cell_km=settings.RIDER_INDEX_CELL_KM)
+    riders_within_radius, _ = rider_index.expanding_search(order_location, **search)
     return riders_within_radius
 
 
-def get_ride_average_cost(riders_within_radius, order_location, recipient_location):
-    rider_emails = [rider["email"] for rider in riders_within_radius]
+def get_trip_legs(order_location, recipient_locations, critical=True):
+    """
+    RouteLeg from the pickup to every recipient, from one matrix request
+    (tiled by the provider) instead of a directions call per recipient.
+    Non-critical callers fall back to cached or estimated legs once map
+    quota runs low; estimated legs are marked ``approximate``.
+    """
+    matrix = map_clients_manager.get_matrix([order_location], recipient_locations, critical=critical)
+    return [
+        cell if cell is not None else get_route_leg(order_location, recipient_location, critical)
+        for cell, recipient_location in zip(matrix[0], recipient_locations)
+    ]
+
+
+def get_ride_average_cost(
+    riders_within_radius, order_location, recipient_location, trip_distance=None, critical=True
+):
+    rider_emails = as_rider_set(riders_within_radius).emails
 
-    # Query Rider model to get charge_per_km for riders within radius
-    riders_within_radius_queryset = Rider.objects.filter(user__email__in=rider_emails)
-    average_charge_per_km = riders_within_radius_queryset.aggregate(
-        avg_charge=Avg("charge_per_km")
-    )["avg_charge"]
+    # Average charge_per_km of the riders within radius from the cached profiles
+    average_charge_per_km = rider_profiles.average_charge_per_km(rider_emails)
 
-    trip_distance = get_distance(order_location, recipient_location)
+    if trip_distance is None:
+        trip_distance = get_distance(order_location, recipient_location, critical)
 
     # Convert trip_distance to Decimal
     trip_distance_decimal = Decimal(str(trip_distance))
@@ -73,7 +128,6 @@ def get_ride_average_cost(riders_within_radius, order_location, recipient_locati
 
 class CreateOrderView(APIView):
     permission_classes = [IsAuthenticated]
-    SEARCH_RADIUS_KM = 5
 
     @transaction.atomic
     def post(self, request, *args, **kwargs):
@@ -128,13 +182,18 @@ class CreateOrderView(APIView):
                 status=status.HTTP_422_UNPROCESSABLE_ENTITY,
             )
 
-        riders_within_radius = get_rider_available(self.SEARCH_RADIUS_KM, order_location)
+        riders_within_radius = get_rider_available(order_location)
 
         if riders_within_radius:
-            cost = get_ride_average_cost(riders_within_radius, order_location, recipient_location)
+            trip_leg = get_route_leg(order_location, recipient_location)
+            cost = get_ride_average_cost(
+                riders_within_radius, order_location, recipient_location, trip_distance=trip_leg.distance_km
+            )
             serializer.save()
             response_data = serializer.data
             response_data["cost"] = cost
+            # The cost is priced on an estimated distance
+            response_data["cost_approximate"] = trip_leg.approximate
             return Response(response_data, status=status.HTTP_201_CREATED)
         else:
             return Response(
@@ -171,7 +230,7 @@ class CreateOrderView(APIView):
 
         # Riders and cost calculation
         order_location = f"{pickup_long},{pickup_lat}"
-        riders_within_radius = get_rider_available(self.SEARCH_RADIUS_KM, order_location)
+        riders_within_radius = get_rider_available(order_location)
         if not riders_within_radius:
             return Response({"error": "No riders found within the search radius."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -187,11 +246,14 @@ class CreateOrderView(APIView):
                 status=status.HTTP_422_UNPROCESSABLE_ENTITY,
             )
         # Calculate costs and save bulk order
-        costs = []
-        for destination in destinations:
-            recipient_location = f"{destination['long']},{destination['lat']}"
-            cost = get_ride_average_cost(riders_within_radius, order_location, recipient_location)
-            costs.append(cost)
+        recipient_locations = [f"{destination['long']},{destination['lat']}" for destination in destinations]
+        trip_legs = get_trip_legs(order_location, recipient_locations)
+        costs = [
+            get_ride_average_cost(
+                riders_within_radius, order_location, recipient_location, trip_distance=trip_leg.distance_km
+            )
+            for recipient_location, trip_leg in zip(recipient_locations, trip_legs)
+        ]
 
         bulk_order = serializer.save(is_bulk=True)
         # bulk_order = serializer.save(is_bulk=True, weight=weight, pickup_address=pickup_address)
@@ -241,11 +303,13 @@ class CreateOrderView(APIView):
                 "message": "Bulk order created successfully.",
                 "bulk_order_id": bulk_order.id,
                 "total_cost": round(sum(costs), 2),
+                "cost_approximate": any(trip_leg.approximate for trip_leg in trip_legs),
                 "destinations": [
                     {
                         "recipient_name": destination["recipient_name"],
                         "recipient_address": destination["recipient_address"],
                         "price": costs[index],
+                        "price_approximate": trip_legs[index].approximate,
                         # "assigned_weight": sub_orders[index].assigned_weight,
 
                         "weight": Decimal(destination["package_weight"]),
@@ -261,7 +325,6 @@ class CreateOrderView(APIView):
 
 class GetAvailableRidersView(APIView):
     permission_classes = [IsAuthenticated]
-    SEARCH_RADIUS_KM = 5  # Define the maximum search radius for riders in kilometers.
 
     def validate_parameters(self, price_offer, order, is_bulk):
         """
@@ -331,42 +394,22 @@ class GetAvailableRidersView(APIView):
             # Format origin coordinates for distance calculations
             origin = f"{origin_long},{origin_lat}"
 
-            # Fetch rider location data from the Supabase service
-            fields = ["rider_email", "current_lat", "current_long"]
-            riders_location_data = supabase.get_supabase_riders(fields=fields)
-
-            # Filter riders based on item weight, capacity, and fragility
-            fragile_query = {"fragile_item_allowed": True} if is_fragile else {}
-            from django.db.models import Q
-
+            # Filter riders based on item weight, capacity, and fragility using the
+            # cached rider profiles instead of a database query per request
             if is_bulk:
                 weights = [package.package_weight for package in order.assignments.all()]
-                rider_queryset = Rider.objects.filter(
-                    user__email__in=[rider["email"] for rider in riders_location_data],
-                    **fragile_query,
-                ).filter(
-                    Q(min_capacity__lte=min(weights), max_capacity__gte=max(weights))
-                )
+                min_weight, max_weight = min(weights), max(weights)
             else:
-                rider_queryset = Rider.objects.filter(
-                    user__email__in=[rider["email"] for rider in riders_location_data],
-                    min_capacity__lte=order.weight,
-                    max_capacity__gte=order.weight,
-                    **fragile_query,
-                )
+                min_weight = max_weight = order.weight
 
-            # Create a mapping of rider emails to Rider objects for efficient lookup
-            rider_email_to_rider = {rider.user.email: rider for rider in rider_queryset}
+            def eligible(emails):
+                return rider_profiles.eligible(emails, min_weight, max_weight, fragile=is_fragile)
 
-            # Compile a list of riders with their current locations
-            riders = []
-            for rider in riders_location_data:
-                rider_email = rider["email"]
-                if rider_email in rider_email_to_rider:
-                    riders.append({
-                        "email": rider_email,
-                        "location": f"{rider['current_long']},{rider['current_lat']}"
-                    })
+            # Grow the search around the pickup point until enough eligible riders
+            # are found to fill one Matrix API request
+            riders = get_rider_available(
+                origin, target=settings.RIDER_MATRIX_TOP_K, eligible=eligible
+            )
 
             # If no riders are found, send a notification to the customer
             if not riders or not origin:
@@ -384,32 +427,16 @@ class GetAvailableRidersView(APIView):
                 if is_bulk else [f"{order.recipient_long},{order.recipient_lat}"]
             )
 
-            # Use the DistanceCalculator to find riders within the search radius
-            calculator = DistanceCalculator(origin)
-            locations_within_radius = calculator.destinations_within_radius(riders, self.SEARCH_RADIUS_KM)
-
-            # If no locations are within the radius, notify the customer
-            if not locations_within_radius:
-                send_customer_notification.delay(
-                    customer=customer.user.email, message="No rider around you"
-                )
-                return Response(
-                    {"status": "error", "message": "No riders found within search radius."},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+            # Riders come back closest first; only the nearest ones are sent to the
+            # paid Matrix API
+            locations_within_radius = riders[:settings.RIDER_MATRIX_TOP_K]
 
             # Use Matrix API to calculate distances and durations for riders and destinations
-            try:
-                results = self.get_matrix_results(origin, locations_within_radius)
-            except Exception as e:
-                # Handle API errors gracefully by switching clients and retrying
-                logger.error(f"Error processing API request: {str(e)}")
-                map_clients_manager.switch_client()
-                results = self.get_matrix_results(origin, locations_within_radius)
+            results = self.get_matrix_results(origin, locations_within_radius)
 
             # Send notifications to riders with the order details and price offer
             send_riders_notification.delay(
-                results,
+                RiderRouteSerializer(results, many=True).data,
                 price=price_offer,
                 request_coordinates={"long": origin_long, "lat": origin_lat},
                 order_id=order_id,
@@ -450,10 +477,8 @@ class GetAvailableRidersView(APIView):
         Returns:
         - results: API response containing distances and durations.
         """
-        # Use the map client to get distances and durations
-        map_client = map_clients_manager.get_client()
-        results = map_client.get_distances_duration(origin, destinations)
-        return results
+        # The manager routes around providers whose circuit is open
+        return map_clients_manager.get_matrix_results(origin, destinations)
 
 
 class OrderDetailView(APIView):
@@ -466,7 +491,6 @@ class OrderDetailView(APIView):
 
 
 class GetOrderDetailByUser(APIView):
-    SEARCH_RADIUS_KM = 5
     permission_classes = [IsAuthenticated]
 
     def get(self, request, email, *args, **kwargs):
@@ -487,15 +511,36 @@ class GetOrderDetailByUser(APIView):
                         assignments = order.assignments.all()
                         assignments_data = []
                         total_cost = 0
+                        riders_by_pickup = {}
 
+                        # Assignments of a bulk order share a pickup point, so the
+                        # radius search and the trip distance matrix only need to
+                        # run once per location
+                        recipients_by_pickup = {}
                         for assignment in assignments:
                             order_location = f"{assignment.pickup_long},{assignment.pickup_lat}"
                             recipient_location = f"{assignment.recipient_long},{assignment.recipient_lat}"
-                            available_riders = get_rider_available(
-                                self.SEARCH_RADIUS_KM, order_location
+                            recipients_by_pickup.setdefault(order_location, []).append(recipient_location)
+                        trip_legs = {}
+                        for order_location, recipient_locations in recipients_by_pickup.items():
+                            riders_by_pickup[order_location] = get_rider_available(order_location)
+                            # Polled quote refresh, so it gives way once map quota runs low
+                            legs = get_trip_legs(order_location, recipient_locations, critical=False)
+                            trip_legs.update(
+                                ((order_location, recipient_location), leg)
+                                for recipient_location, leg in zip(recipient_locations, legs)
                             )
+
+                        for assignment in assignments:
+                            order_location = f"{assignment.pickup_long},{assignment.pickup_lat}"
+                            recipient_location = f"{assignment.recipient_long},{assignment.recipient_lat}"
+                            available_riders = riders_by_pickup[order_location]
+                            trip_leg = trip_legs[(order_location, recipient_location)]
                             cost = get_ride_average_cost(
-                                available_riders, order_location, recipient_location
+                                available_riders,
+                                order_location,
+                                recipient_location,
+                                trip_distance=trip_leg.distance_km,
                             )
                             total_cost += cost
                             assignments_data.append({
@@ -505,6 +550,7 @@ class GetOrderDetailByUser(APIView):
                                 # "distance": assignment.distance,
                                 # "duration": assignment.duration,
                                 "cost": cost,
+                                "cost_approximate": trip_leg.approximate,
                                 "pickup_location": order_location,
                                 "recipient_location": recipient_location,
                             })
@@ -512,18 +558,19 @@ class GetOrderDetailByUser(APIView):
                         extra_data["assignments"] = assignments_data
                         extra_data["bulk_order_status"] = self.get_bulk_order_status(assignments)
                         extra_data["cost"] = total_cost
+                        extra_data["cost_approximate"] = any(leg.approximate for leg in trip_legs.values())
 
                     else:
                         # Single order handling
                         order_location = f"{order.pickup_long},{order.pickup_lat}"
                         recipient_location = f"{order.recipient_long},{order.recipient_lat}"
-                        available_riders = get_rider_available(
-                            self.SEARCH_RADIUS_KM, order_location
-                        )
+                        available_riders = get_rider_available(order_location)
+                        trip_leg = get_route_leg(order_location, recipient_location, critical=False)
                         cost = get_ride_average_cost(
-                            available_riders, order_location, recipient_location
+                            available_riders, order_location, recipient_location, trip_distance=trip_leg.distance_km
                         )
                         extra_data["cost"] = cost
+                        extra_data["cost_approximate"] = trip_leg.approximate
 
                 # Serialize order details
                 serializer = OrderDetailUserSerializer(order)
@@ -590,27 +637,18 @@ class AcceptOrDeclineOrderView(APIView):
             order_location = f"{pickup_long},{pickup_lat}"
             recipient_location = f"{recipient_long},{recipient_lat}"
 
-            conditions = [{"column": "rider_email", "value": rider.user.email}]
-            fields = ["rider_email", "current_lat", "current_long"]
+            rider_data = get_rider_locations([rider.user.email])
 
-            rider_data = supabase.get_supabase_riders(
-                conditions=conditions, fields=fields
-            )
+            result = self.get_matrix_results(order_location, rider_data)
 
-            try:
-                result = self.get_matrix_results(order_location, rider_data)
-            except Exception as e:
-                logger.error(f"Error processing API request: {str(e)}")
-                map_clients_manager.switch_client()
-                result = self.get_matrix_results(order_location, rider_data)
+            route = RiderRouteSerializer(result[0]).data
+            distance = route["distance"]
+            duration = route["duration"]
 
-            distance = result[0]["distance"]
-            duration = result[0]["duration"]
-
-            trip_distance = get_distance(order_location, recipient_location)
+            trip_leg = get_route_leg(order_location, recipient_location)
 
             # Calculate the cost of the ride based on the distance of the trip
-            cost_of_ride = round((float(rider.charge_per_km) * trip_distance), 2)
+            cost_of_ride = round((float(rider.charge_per_km) * trip_leg.distance_km), 2)
 
             rider_info = {
                 "rider_name": rider.user.get_full_name,
@@ -621,6 +659,7 @@ class AcceptOrDeclineOrderView(APIView):
                 "duration": duration,
                 "order_completed": rider.completed_orders,
                 "price": price if price else cost_of_ride,
+                "price_approximate": not price and trip_leg.approximate,
             }
             send_customer_notification.delay(
                 customer=order.customer.user.email,
@@ -635,7 +674,7 @@ class AcceptOrDeclineOrderView(APIView):
             )
         elif reason and not accept:
             rider.declined_requests += 1
-            rider.save()
+            rider.save(update_fields=["declined_requests"])
             # Create and save DeclinedOrder instance
             DeclinedOrder.objects.create(
                 order=order,
@@ -652,9 +691,7 @@ class AcceptOrDeclineOrderView(APIView):
 
     def get_matrix_results(self, origin, destinations):
         """Get results from Matrix API."""
-        map_client = map_clients_manager.get_client()
-        results = map_client.get_distances_duration(origin, destinations)
-        return results
+        return map_clients_manager.get_matrix_results(origin, destinations)
 
 
 class AssignOrderToRiderView(APIView):
@@ -693,27 +730,15 @@ class AssignOrderToRiderView(APIView):
             # Get the order location
             order_location = f"{order.pickup_long},{order.pickup_lat}"
 
-            # Define conditions and fields for retrieving rider data from supabase
-            conditions = [{"column": "rider_email", "value": rider_email}]
-            fields = ["rider_email", "current_lat", "current_long"]
-
-            # Retrieve rider data from supabase
-            rider_data = supabase.get_supabase_riders(
-                conditions=conditions, fields=fields
-            )
+            # Retrieve the rider's current location
+            rider_data = get_rider_locations([rider_email])
 
-            try:
-                # Get distance and duration from the matrix results
-                result = self.get_matrix_results(order_location, rider_data)
-            except Exception as e:
-                # Handle exception and retry
-                logger.error(f"Error processing API request: {str(e)}")
-                map_clients_manager.switch_client()
-                result = self.get_matrix_results(order_location, rider_data)
+            result = self.get_matrix_results(order_location, rider_data)
 
             # Extract distance and duration from the result
-            distance = result[0]["distance"]
-            duration = result[0]["duration"]
+            route = RiderRouteSerializer(result[0]).data
+            distance = route["distance"]
+            duration = route["duration"]
 
             # Send notification to the rider
             rider_message = (
@@ -728,7 +753,7 @@ class AssignOrderToRiderView(APIView):
             wallet.updated_at = timezone.now()
             wallet.save()
             order.distance = distance
-            order.duration = duration
+            order.duration_seconds = round(result[0].leg.duration_s)
             order.price = decimal.Decimal(price) * 100
             order.order_completion_code = code
             order.save()
@@ -755,7 +780,7 @@ class AssignOrderToRiderView(APIView):
             response_data["duration"] = duration
 
             send_riders_notification.delay(
-                result,
+                [route],
                 message=rider_message,
                 order_id=order_id,
                 price=price,
@@ -780,10 +805,8 @@ class AssignOrderToRiderView(APIView):
             return Response("Rider or Order not found")
 
     def get_matrix_results(self, origin, destinations):
-        """Get results from Matrix API."""
-        map_client = map_clients_manager.get_client()
-        results = map_client.get_distances_duration(origin, destinations)
-        return results
+        """Get results from Matrix API, hedged as the customer waits on it."""
+        return map_clients_manager.get_matrix_results(origin, destinations, hedge_endpoint="assign_order")
 
 
 class UpdateOrderStatusView(APIView):
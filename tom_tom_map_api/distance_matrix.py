@@ -1,52 +1,76 @@
-import requests
 import logging
+import time
+
+from django.conf import settings
+
+from map_clients.http import map_session
+from map_clients.quota import quota_meter
+from map_clients.rate_limit import get_rate_limiter
+from map_clients.routes import RouteLeg
+from map_clients.tiling import cell_tiles
 
 
 class TomTomDistanceMatrix:
     def __init__(self, api_key):
         self.api_key = api_key
+        self.sync_url = "https://api.tomtom.com/routing/matrix/2"
         self.base_url = "https://api.tomtom.com/routing/matrix/2/async"
         self.logger = logging.getLogger(__name__)
 
-    def post_async_matrix(self, origin, riders_locations_data):
+    @staticmethod
+    def build_payload(sources, destinations):
+        def point(location):
+            long, lat = map(float, location.split(","))
+            return {"point": {"latitude": lat, "longitude": long}}
+
+        return {
+            "origins": [point(location) for location in sources],
+            "destinations": [point(location) for location in destinations],
+            "options": {"routeType": "fastest", "vehicleMaxSpeed": 120},
+        }
+
+    def post_sync_matrix(self, sources, destinations):
         """
-        Post distance and duration between origin and multiple riders_locations_data using TomTom Matrix API.
+        Get distances and durations for a small matrix using the synchronous
+        TomTom Matrix API, which answers in the same request.
 
         Args:
-            origin (str): Origin coordinates in the format 'longitude,latitude'.
-            riders_locations_data (list of dict): List of dictionaries, each containing 'email' and 'location' keys.
-                                    'location' is a string in the format 'longitude,latitude'.
+            sources (list of str): Coordinates in the format 'longitude,latitude'.
+            destinations (list of str): Coordinates in the format 'longitude,latitude'.
+
+        Returns:
+            list: The 'data' cells of the matrix response.
+        """
+        headers = {"Content-Type": "application/json"}
+
+        url = f"{self.sync_url}?key={self.api_key}"
+        get_rate_limiter("tomtom_matrix").acquire(timeout=settings.RATE_LIMIT_TIMEOUT_SECONDS)
+        response = map_session.post(url, headers=headers, json=self.build_payload(sources, destinations))
+
+        if response.status_code == 200:
+            return response.json().get("data", [])
+        self.logger.error(f"Failed to get sync matrix. Status code: {response.status_code}")
+        raise Exception(
+            f"Failed to get sync matrix. Status code: {response.status_code}. Error: {response.text}"
+        )
+
+    def post_async_matrix(self, sources, destinations):
+        """
+        Post an async matrix job using TomTom Matrix API.
+
+        Args:
+            sources (list of str): Coordinates in the format 'longitude,latitude'.
+            destinations (list of str): Coordinates in the format 'longitude,latitude'.
 
         Returns:
             str: JSON response from the API containing jobId and state.
         """
         try:
-            origin_long, origin_lat = map(float, origin.split(","))
-            if not riders_locations_data:
-                self.logger.warning("No rider locations provided.")
-                return None
-
-            rider_locations = [
-                {
-                    "point": {
-                        "latitude": float(item["location"].split(",")[1]),
-                        "longitude": float(item["location"].split(",")[0]),
-                    }
-                }
-                for item in riders_locations_data
-            ]
-
-            payload = {
-                "origins": [
-                    {"point": {"latitude": origin_lat, "longitude": origin_long}}
-                ],
-                "destinations": rider_locations,
-                "options": {"routeType": "fastest", "vehicleMaxSpeed": 120},
-            }
             headers = {"Content-Type": "application/json"}
 
             url = f"{self.base_url}?key={self.api_key}"
-            response = requests.post(url, headers=headers, json=payload)
+            get_rate_limiter("tomtom_matrix").acquire(timeout=settings.RATE_LIMIT_TIMEOUT_SECONDS)
+            response = map_session.post(url, headers=headers, json=self.build_payload(sources, destinations))
 
             if response.status_code == 202:
                 return response.json()
@@ -62,78 +86,105 @@ class TomTomDistanceMatrix:
             self.logger.exception(f"Error occurred while posting async matrix: {e}")
             raise e
 
-    def get_async_response(self, origin, riders_locations_data):
+    def wait_for_job(self, job_id, state=None):
         """
-        Get distance and duration between origin and multiple riders_locations using TomTom Matrix API.
+        Poll the status of an async matrix job until it completes.
 
-        Args:
-        - origin (str): Origin coordinates in the format 'longitude,latitude'.
-        - riders_locations (list of dict): List of dictionaries, each containing 'email' and 'location' keys.
-                                    'location' is a string in the format 'longitude,latitude'.
+        The first check comes after TOMTOM_POLL_INITIAL_SECONDS and every wait
+        grows by TOMTOM_POLL_BACKOFF up to TOMTOM_POLL_MAX_SECONDS, so small jobs
+        are picked up quickly while long ones are not hammered.
 
-        Returns:
-        - List of dictionaries: List of dictionaries, each containing 'email', 'distance' (in meters), and
-                                'duration' (in minutes) for each location.
+        Raises:
+            TimeoutError: If the job is not done within TOMTOM_MATRIX_DEADLINE_SECONDS.
+            Exception: If TomTom reports the job as failed or rejected.
         """
-        try:
-            results = []
-            post_response = self.post_async_matrix(origin, riders_locations_data)
-            if not post_response:
-                return None
+        url = f"{self.base_url}/{job_id}"
+        params = {"key": self.api_key}
+        deadline = time.monotonic() + settings.TOMTOM_MATRIX_DEADLINE_SECONDS
+        delay = settings.TOMTOM_POLL_INITIAL_SECONDS
+
+        while state != "Completed":
+            if state in ("Failed", "Rejected"):
+                raise Exception(f"TomTom matrix job {job_id} {state.lower()}")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"TomTom matrix job {job_id} not completed in time")
+            time.sleep(min(delay, remaining))
+            delay = min(delay * settings.TOMTOM_POLL_BACKOFF, settings.TOMTOM_POLL_MAX_SECONDS)
+
+            get_rate_limiter("tomtom_matrix").acquire(timeout=settings.RATE_LIMIT_TIMEOUT_SECONDS)
+            response = map_session.get(url, params=params)
+            if response.status_code != 200:
+                raise Exception(
+                    f"Failed to get async matrix status. Status code: {response.status_code}"
+                )
+            state = response.json().get("state")
+
+    def fetch_async_matrix(self, sources, destinations):
+        """Post an async matrix job, wait for it and return the 'data' cells of its result."""
+        post_response = self.post_async_matrix(sources, destinations)
+        job_id = post_response.get("jobId")
+        self.wait_for_job(job_id, post_response.get("state"))
+
+        url = f"{self.base_url}/{job_id}/result"
+        params = {"key": self.api_key}
+
+        get_rate_limiter("tomtom_matrix").acquire(timeout=settings.RATE_LIMIT_TIMEOUT_SECONDS)
+        response = map_session.get(url, params=params)
+        if response.status_code == 200:
+            return response.json().get("data", [])
+        self.logger.error(
+            f"Failed to get async response. Status code: {response.status_code}"
+        )
+        raise Exception(
+            f"Failed to get async response. Status code: {response.status_code}"
+        )
+
+    def get_matrix(self, sources, destinations):
+        """
+        Get distances and durations from every source to every destination.
+
+        The matrix is split into tiles of at most TOMTOM_MATRIX_MAX_CELLS cells.
+        Tiles of up to TOMTOM_SYNC_MAX_CELLS cells go to the synchronous endpoint
+        in a single request; larger ones are posted as async jobs which are
+        polled until done.
 
-            job_id = post_response.get("jobId")
-            url = f"{self.base_url}/{job_id}/result"
-            params = {"key": self.api_key}
+        Args:
+            sources (list of str): Coordinates in the format 'longitude,latitude'.
+            destinations (list of str): Coordinates in the format 'longitude,latitude'.
 
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json().get("data", [])
+        Returns:
+            List of rows, one per source, each with one cell per destination: a RouteLeg in meters
+            and seconds, or None when TomTom found no route.
+        """
+        matrix = [[None] * len(destinations) for _ in sources]
+        if not sources or not destinations:
+            return matrix
 
-                for i, item in enumerate(data):
-                    route_summary = item.get("routeSummary", {})
+        try:
+            for source_slice, destination_slice in cell_tiles(
+                len(sources), len(destinations), settings.TOMTOM_MATRIX_MAX_CELLS
+            ):
+                tile_sources = sources[source_slice]
+                tile_destinations = destinations[destination_slice]
+                if len(tile_sources) * len(tile_destinations) <= settings.TOMTOM_SYNC_MAX_CELLS:
+                    data = self.post_sync_matrix(tile_sources, tile_destinations)
+                else:
+                    data = self.fetch_async_matrix(tile_sources, tile_destinations)
+                quota_meter.record("tomtom", len(tile_sources) * len(tile_destinations))
+
+                for item in data:
+                    route_summary = item.get("routeSummary")
+                    if route_summary is None:
+                        continue
                     distance = route_summary.get("lengthInMeters", 0)
                     duration = route_summary.get("travelTimeInSeconds", 0)
-
-                    distance = round(distance / 1000, 2)
-
-                    formatted_duration = self.format_duration(duration)
-                    results.append(
-                        {
-                            "email": riders_locations_data[i]["email"],
-                            "distance": distance,
-                            "duration": formatted_duration,
-                        }
-                    )
-
-                return results
-            else:
-                self.logger.error(
-                    f"Failed to get async response. Status code: {response.status_code}"
-                )
-                raise Exception(
-                    f"Failed to get async response. Status code: {response.status_code}"
-                )
+                    i = source_slice.start + item["originIndex"]
+                    j = destination_slice.start + item["destinationIndex"]
+                    matrix[i][j] = RouteLeg(distance, duration)
+            return matrix
 
         except Exception as e:
-            self.logger.exception(f"Error occurred while getting async response: {e}")
+            self.logger.exception(f"Error occurred while getting matrix: {e}")
             raise e
-
-    @staticmethod
-    def format_duration(duration: int) -> str:
-        """
-        Format a duration in seconds into a human-readable format.
-
-        Parameters:
-        - duration (int): The duration in seconds.
-
-        Returns:
-        - str: The formatted duration string.
-        """
-        duration_minutes, duration_seconds = divmod(duration, 60)
-
-        if duration <= 60:
-            return f"{duration} secs"
-        elif duration_seconds == 0:
-            return f"{duration_minutes} minutes"
-        else:
-            return f"{duration_minutes} mins {duration_seconds} secs"